@@ -1,4 +1,18 @@
-from .pipeline import run
 from .config import Config
 
-__all__ = ["run", "Config"]
+__all__ = ["run", "preview", "Config"]
+
+
+def __getattr__(name):
+    # The pipeline pulls in cv2, scipy and tifffile; load it on first use
+    # Importing the submodule binds astrostakos.preview to the module, so
+    # the function is bound explicitly afterwards
+    if name == "run":
+        from .pipeline import run
+        globals()["run"] = run
+        return run
+    if name == "preview":
+        from .preview import preview
+        globals()["preview"] = preview
+        return preview
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,49 +1,290 @@
 import numpy as np
-from scipy.ndimage import gaussian_filter
+import cv2
 import concurrent.futures
 from .utils import create_blend_weights
+from .filters import gaussian, TRUNCATE
+from .tracing import NULL_TRACER
 
 
-def process_block(block, bg_kernel):
-    return gaussian_filter(block, sigma=bg_kernel / 10)
+def process_block(block, bg_kernel, backend="auto"):
+    return gaussian(block, bg_kernel / 10, backend)
 
 
-def estimate_background_tiled(channel, config, on_progress=None):
-    h, w = channel.shape
-    background = np.zeros_like(channel)
-    weight_sum = np.zeros_like(channel)
+def estimate_background(image, config, on_progress=None, tracer=NULL_TRACER,
+                        origin=0, height=None):
+    """
+    Estimate the background of an HxW or HxWxC image in a single pass
+    using the engine selected by config.BG_MODE ("tiled" or "multires").
 
+    origin, height: image holds rows origin:origin+H of a taller image of
+                    height rows (streaming bands); see
+                    estimate_background_tiled and
+                    estimate_background_multires.
+    """
+    if config.BG_MODE == "multires":
+        return estimate_background_multires(image, config, on_progress, origin)
+    if config.BG_MODE == "tiled":
+        return estimate_background_tiled(image, config, on_progress, tracer,
+                                         origin, height)
+    raise ValueError(f"Unknown BG_MODE: {config.BG_MODE!r}")
+
+
+def _tile_grid(h, w, config, origin=0, height=None):
+    """
+    Return (tiles, groups): every tile as (y1, y2, x1, x2), and the tiles
+    split into groups whose members never overlap, so that tiles of one
+    group can be accumulated concurrently without locking.
+
+    With origin and height the h rows are rows origin:origin+h of an
+    image of height rows; only the tiles of that image's grid lying
+    entirely within them are returned, in band coordinates.
+    """
     step = config.BLOCK_SIZE - config.OVERLAP
-    tiles = [
-        (y, min(y + config.BLOCK_SIZE, h),
-         x, min(x + config.BLOCK_SIZE, w))
-        for y in range(0, h, step)
-        for x in range(0, w, step)
-    ]
+    if step <= 0:
+        raise ValueError("BLOCK_SIZE must be larger than OVERLAP")
+    stride = -(-config.BLOCK_SIZE // step)
+    height = h if height is None else height
 
-    def compute(tile):
-        y1, y2, x1, x2 = tile
-        block = channel[y1:y2, x1:x2]
-        bg = process_block(block, config.BG_KERNEL)
-        weights = create_blend_weights(y2 - y1, x2 - x1, config.OVERLAP)
-        return tile, bg, weights
+    tiles = []
+    groups = {}
+    for iy, y in enumerate(range(0, height, step)):
+        y2 = min(y + config.BLOCK_SIZE, height)
+        if y < origin or y2 > origin + h:
+            continue
+        for ix, x in enumerate(range(0, w, step)):
+            tile = (y - origin, y2 - origin,
+                    x, min(x + config.BLOCK_SIZE, w))
+            tiles.append(tile)
+            groups.setdefault((iy % stride, ix % stride), []).append(tile)
+
+    return tiles, [groups[k] for k in sorted(groups)]
+
+
+def _accumulate_tile(image, background, weight_sum, tile,
+                     bg_kernel, overlap, backend):
+    y1, y2, x1, x2 = tile
+    bg = process_block(image[y1:y2, x1:x2], bg_kernel, backend)
+    wgt = create_blend_weights(y2 - y1, x2 - x1, overlap)
+    bg *= wgt if bg.ndim == 2 else wgt[..., None]
+    background[y1:y2, x1:x2] += bg
+    weight_sum[y1:y2, x1:x2] += wgt
+
+
+# Buffers attached once per worker process by _init_shared_worker
+_shared = {}
+
+
+def _init_shared_worker(specs, params):
+    from multiprocessing import shared_memory
+
+    for name, (shm_name, shape, dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _shared[name] = (shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+    _shared["params"] = params
 
-    total = len(tiles)
+
+def _accumulate_tile_shared(tile):
+    _accumulate_tile(
+        _shared["image"][1],
+        _shared["background"][1],
+        _shared["weight_sum"][1],
+        tile,
+        *_shared["params"]
+    )
+    return tile
+
+
+def _tile_params(config):
+    return config.BG_KERNEL, config.OVERLAP, config.FILTER_BACKEND
+
+
+def _run_serial(groups, image, background, weight_sum, config, tick, tracer):
+    for group in groups:
+        for tile in group:
+            with tracer.span("background_tile", tile=tile):
+                _accumulate_tile(image, background, weight_sum, tile,
+                                 *_tile_params(config))
+            tick()
+
+
+def _run_threads(groups, image, background, weight_sum, config, tick, tracer):
+    def compute(tile):
+        with tracer.span("background_tile", tile=tile):
+            _accumulate_tile(image, background, weight_sum, tile,
+                             *_tile_params(config))
 
     with concurrent.futures.ThreadPoolExecutor(
         max_workers=config.NUM_WORKERS
     ) as ex:
-        for idx, (tile, bg, wgt) in enumerate(ex.map(compute, tiles)):
-            y1, y2, x1, x2 = tile
-            background[y1:y2, x1:x2] += bg * wgt
-            weight_sum[y1:y2, x1:x2] += wgt
+        for group in groups:
+            for _ in ex.map(compute, group):
+                tick()
+
+
+def _run_processes(groups, image, background, weight_sum, config, tick, tracer):
+    from multiprocessing import shared_memory
+
+    arrays = {"image": image, "background": background, "weight_sum": weight_sum}
+    shms = {}
+    try:
+        views = {}
+        for name, arr in arrays.items():
+            shm = shared_memory.SharedMemory(create=True, size=max(1, arr.nbytes))
+            shms[name] = shm
+            views[name] = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)
+            views[name][...] = arr
+        specs = {
+            name: (shms[name].name, arr.shape, arr.dtype.str)
+            for name, arr in arrays.items()
+        }
+
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=config.NUM_WORKERS,
+            initializer=_init_shared_worker,
+            initargs=(specs, _tile_params(config)),
+        ) as ex:
+            for group in groups:
+                # Workers cannot record into the parent's tracer, so
+                # each non-overlapping group is one span
+                with tracer.span("background_tile_group", tiles=len(group)):
+                    for _ in ex.map(_accumulate_tile_shared, group):
+                        tick()
+
+        background[...] = views["background"]
+        weight_sum[...] = views["weight_sum"]
+    finally:
+        views = None
+        for shm in shms.values():
+            shm.close()
+            shm.unlink()
+
+
+_EXECUTORS = {
+    "serial": _run_serial,
+    "threads": _run_threads,
+    "processes": _run_processes,
+}
+
+
+def estimate_background_tiled(image, config, on_progress=None, tracer=NULL_TRACER,
+                              origin=0, height=None):
+    """
+    Tiled background estimation. Tiles are dispatched through the backend
+    named by config.BG_EXECUTOR ("threads", "processes" or "serial").
+    The "processes" backend shares the image and accumulators with its
+    workers through multiprocessing.shared_memory, so only tile
+    coordinates cross process boundaries.
+
+    tracer: records a span per tile (per tile group with "processes").
+    origin, height: image is rows origin:origin+H of an image of height
+                    rows. The tiles of that image's grid are used, and
+                    only those lying wholly within the band, so rows at
+                    least BLOCK_SIZE from a band edge (or at the image
+                    edge) match the whole-image result exactly.
+    """
+    try:
+        executor = _EXECUTORS[config.BG_EXECUTOR]
+    except KeyError:
+        raise ValueError(f"Unknown BG_EXECUTOR: {config.BG_EXECUTOR!r}") from None
+
+    h, w = image.shape[:2]
+    image = np.ascontiguousarray(image)
+    background = np.zeros_like(image)
+    weight_sum = np.zeros((h, w), dtype=image.dtype)
+
+    tiles, groups = _tile_grid(h, w, config, origin, height)
+    total = len(tiles)
+    done = 0
+
+    def tick():
+        nonlocal done
+        done += 1
+        if on_progress:
+            cont = on_progress(done / total, f"tile {done}/{total}")
+            if cont is False:
+                raise RuntimeError("Cancelled")
+
+    executor(groups, image, background, weight_sum, config, tick, tracer)
+
+    if on_progress:
+        on_progress(1.0, "background complete")
+
+    if image.ndim == 3:
+        weight_sum = weight_sum[..., None]
+    return np.divide(background, weight_sum, out=np.zeros_like(background),
+                     where=weight_sum > 0)
+
+
+def estimate_background_multires(image, config, on_progress=None, origin=0):
+    """
+    Build the background model on a grid decimated by config.BG_DOWNSAMPLE
+    and upsample it bilinearly back to full resolution.
+
+    The area-average decimation and the bilinear upsampling both act as
+    low-pass filters, so the blur applied on the coarse grid is reduced
+    until the three stages together have the variance of the full
+    resolution Gaussian (sigma = BG_KERNEL / 10) used by the tiled path.
+    On normalized stacks the model stays within 2e-3 (absolute) of the
+    tiled background everywhere except the outermost row and column,
+    which the tiled path leaves at zero blend weight.
+
+    The coarse grid is made of whole factor x factor blocks anchored at
+    row 0 of the whole image, over the image mirrored outwards by the
+    coarse blur's reach. origin is the image's first row within the whole
+    image, so a band (streaming) uses the same grid and matches the
+    whole-image model away from its edges.
+    """
+    h, w = image.shape[:2]
+    sigma = config.BG_KERNEL / 10
+    factor = max(1, int(config.BG_DOWNSAMPLE))
+
+    # Coarse grid must keep enough samples to represent the blur
+    factor = min(factor, max(1, int(sigma)), h, w)
+    if factor == 1:
+        bg = process_block(image, config.BG_KERNEL, config.FILTER_BACKEND)
+        if on_progress:
+            on_progress(1.0, "background complete")
+        return bg
+
+    # Box decimation adds (f^2 - 1) / 12 and bilinear upsampling f^2 / 6
+    # of variance (in full-resolution pixels^2)
+    residual = sigma ** 2 - (factor ** 2 - 1) / 12 - factor ** 2 / 6
+    small_sigma = np.sqrt(max(residual, 0.0)) / factor
+
+    # Rows before the first block boundary of the whole-image grid
+    skip = min(-origin % factor, h - 1)
+    rows = h - skip
+    # Mirror whole blocks beyond the coarse blur's reach around the image,
+    # as the full-resolution blur's reflect border would, and complete the
+    # last partial blocks
+    pad = (int(TRUNCATE * small_sigma + 0.5) + 2) * factor
+    src = cv2.copyMakeBorder(
+        np.ascontiguousarray(image[skip:], dtype=np.float32),
+        pad, pad + (-rows) % factor, pad, pad + (-w) % factor, cv2.BORDER_REFLECT
+    )
+    small_h, small_w = src.shape[0] // factor, src.shape[1] // factor
+    small = cv2.resize(src, (small_w, small_h), interpolation=cv2.INTER_AREA)
+
+    if on_progress:
+        cont = on_progress(0.3, f"decimated {w}x{h} -> {small_w}x{small_h}")
+        if cont is False:
+            raise RuntimeError("Cancelled")
+
+    small = gaussian(small.reshape(small_h, small_w, *image.shape[2:]),
+                     small_sigma, config.FILTER_BACKEND)
+
+    if on_progress:
+        cont = on_progress(0.7, "upsampling background")
+        if cont is False:
+            raise RuntimeError("Cancelled")
 
-            if on_progress:
-                cont = on_progress((idx + 1) / total, f"tile {idx+1}/{total}")
-                if cont is False:
-                    raise RuntimeError("Cancelled")
+    bg = cv2.resize(small, (small_w * factor, small_h * factor),
+                    interpolation=cv2.INTER_LINEAR)[pad:pad + rows, pad:pad + w]
+    bg = bg.reshape(rows, w, *image.shape[2:])
+    if skip:
+        bg = np.concatenate([np.repeat(bg[:1], skip, axis=0), bg])
 
     if on_progress:
         on_progress(1.0, "background complete")
 
-    return np.divide(background, weight_sum, where=weight_sum > 0)
\ No newline at end of file
+    return bg.astype(image.dtype, copy=False)
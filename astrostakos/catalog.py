@@ -0,0 +1,121 @@
+import numpy as np
+
+
+STAR_DTYPE = np.dtype([
+    ("x", np.float32),
+    ("y", np.float32),
+    ("area", np.int32),
+    ("peak", np.float32),
+    ("flux", np.float32),
+    ("fwhm", np.float32),
+])
+
+
+class StarCatalog:
+    """
+    Array-backed list of detected stars.
+
+    Columns (see STAR_DTYPE): signal-weighted centroid x/y in pixels,
+    component area in pixels, peak value, flux as the summed high-pass
+    signal, and an approximate FWHM from the second moments.
+    """
+
+    def __init__(self, data=None):
+        self.data = np.zeros(0, STAR_DTYPE) if data is None else data
+        self._tree = None
+
+    def __len__(self):
+        return len(self.data)
+
+    @classmethod
+    def from_components(cls, labels, keep, channel, signal):
+        """
+        Measure the components of labels flagged in keep (indexed by
+        label) on channel (peak) and signal (centroid, flux, FWHM).
+        """
+        ids = np.flatnonzero(keep)
+        remap = np.full(len(keep), -1, np.int64)
+        remap[ids] = np.arange(len(ids))
+
+        idx = np.flatnonzero(keep[labels])
+        star = remap[labels.ravel()[idx]]
+        ys, xs = np.divmod(idx, labels.shape[1])
+        sig = np.maximum(signal.ravel()[idx], 0).astype(np.float64)
+        n = len(ids)
+
+        def total(weights=None):
+            return np.bincount(star, weights, minlength=n)
+
+        flux = total(sig)
+        norm = np.where(flux > 0, flux, 1.0)
+        cx = total(sig * xs) / norm
+        cy = total(sig * ys) / norm
+        var = (total(sig * xs * xs) + total(sig * ys * ys)) / norm - cx ** 2 - cy ** 2
+
+        peak = np.full(n, -np.inf)
+        np.maximum.at(peak, star, channel.ravel()[idx])
+
+        data = np.zeros(n, STAR_DTYPE)
+        data["x"] = cx
+        data["y"] = cy
+        data["area"] = total()
+        data["peak"] = peak
+        data["flux"] = flux
+        data["fwhm"] = 2.3548 * np.sqrt(np.maximum(var, 0) / 2)
+        return cls(data)
+
+    @classmethod
+    def concatenate(cls, catalogs):
+        return cls(np.concatenate([c.data for c in catalogs] or [np.zeros(0, STAR_DTYPE)]))
+
+    def shifted(self, dy=0.0, dx=0.0):
+        data = self.data.copy()
+        data["y"] += dy
+        data["x"] += dx
+        return StarCatalog(data)
+
+    def select(self, mask):
+        return StarCatalog(self.data[mask])
+
+    @property
+    def tree(self):
+        """KD-tree over (x, y), built on first use."""
+        if self._tree is None:
+            from scipy.spatial import cKDTree
+
+            self._tree = cKDTree(np.column_stack([self.data["x"], self.data["y"]]))
+        return self._tree
+
+    def within(self, x, y, radius):
+        """Indices of stars within radius pixels of (x, y)."""
+        return np.asarray(self.tree.query_ball_point((x, y), radius), dtype=np.int64)
+
+    def nearest(self, x, y, k=1):
+        """(distances, indices) of the k stars closest to (x, y)."""
+        return self.tree.query((x, y), k=k)
+
+    def to_csv(self, path):
+        np.savetxt(
+            path, self.data, delimiter=",",
+            header=",".join(STAR_DTYPE.names), comments="",
+            fmt=["%.3f", "%.3f", "%d", "%.6g", "%.6g", "%.3f"],
+        )
+
+    def to_npz(self, path):
+        np.savez_compressed(path, **{name: self.data[name] for name in STAR_DTYPE.names})
+
+    @classmethod
+    def from_npz(cls, path):
+        with np.load(path) as f:
+            data = np.zeros(len(f["x"]), STAR_DTYPE)
+            for name in STAR_DTYPE.names:
+                data[name] = f[name]
+        return cls(data)
+
+    def save(self, path):
+        """Write as CSV or NPZ depending on the path suffix."""
+        if str(path).lower().endswith(".npz"):
+            self.to_npz(path)
+        else:
+            self.to_csv(path)
+        return path
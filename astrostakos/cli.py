@@ -1,12 +1,200 @@
-from .io import select_input_file
-from .pipeline import run
+import argparse
+import ast
+import concurrent.futures
+import glob
+import os
+import sys
+import time
 
+from .config import Config
 
-def main():
-    path = select_input_file()
-    out = run(path)
-    print(f"Saved to {out}")
+INPUT_EXTS = (".tif", ".tiff", ".fits", ".fit", ".fts")
+OUTPUT_EXTS = (".tif", ".fits")
+OUTPUT_SUFFIX = "_enhanced"
+UP_TO_DATE = "up to date"
+
+
+def _parse_override(text):
+    key, sep, value = text.partition("=")
+    if not sep or not hasattr(Config, key):
+        raise argparse.ArgumentTypeError(f"expected CONFIG_FIELD=VALUE, got {text!r}")
+    try:
+        value = ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        pass  # plain string
+    return key, value
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="astrostakos",
+        description="Enhance stacked star images. Without inputs, opens a file dialog."
+    )
+    parser.add_argument("inputs", nargs="*",
+                        help="TIFF/FITS files, glob patterns or directories")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="descend into subdirectories of directory inputs")
+    parser.add_argument("--name", default="*",
+                        help="file name pattern inside directories (default: all stacks)")
+    parser.add_argument("-c", "--cores", type=int, default=os.cpu_count() or 1,
+                        help="total cores to use across all jobs")
+    parser.add_argument("-w", "--workers", type=int, default=Config.NUM_WORKERS,
+                        help="NUM_WORKERS inside each job")
+    parser.add_argument("-f", "--force", action="store_true",
+                        help="reprocess inputs whose output is already up to date")
+    parser.add_argument("--set", dest="overrides", action="append", default=[],
+                        type=_parse_override, metavar="FIELD=VALUE",
+                        help="override a Config field, e.g. --set STRETCH_STRENGTH=12")
+    return parser
+
+
+def find_inputs(patterns, recursive=False, name="*"):
+    """Expand files, globs and directories into a sorted list of input stacks."""
+    found = set()
+    for pattern in patterns:
+        matches = glob.glob(pattern, recursive=True) or [pattern]
+        for path in matches:
+            if os.path.isdir(path):
+                sub = os.path.join(path, "**", name) if recursive else os.path.join(path, name)
+                candidates = glob.glob(sub, recursive=recursive)
+            else:
+                candidates = [path]
+            for c in candidates:
+                base, ext = os.path.splitext(c)
+                if (os.path.isfile(c) and ext.lower() in INPUT_EXTS
+                        and not base.endswith(OUTPUT_SUFFIX)):
+                    found.add(os.path.abspath(c))
+    return sorted(found)
+
+
+def missing_inputs(patterns):
+    """Patterns that name neither an existing path nor any glob match."""
+    return [p for p in patterns if not os.path.exists(p) and not glob.glob(p, recursive=True)]
+
+
+def existing_output(input_file):
+    """Newest output previously written for input_file, or None."""
+    base = os.path.splitext(input_file)[0]
+    outputs = [
+        path for path in glob.glob(f"{glob.escape(base)}_stars_*{OUTPUT_SUFFIX}.*")
+        if os.path.splitext(path)[1] in OUTPUT_EXTS
+    ]
+    return max(outputs, key=os.path.getmtime, default=None)
+
+
+def is_up_to_date(input_file):
+    """
+    Whether an output newer than input_file exists. Only mtimes are
+    compared, not the settings the output was made with.
+    """
+    out = existing_output(input_file)
+    return out is not None and os.path.getmtime(out) >= os.path.getmtime(input_file)
+
+
+def _process(input_file, overrides):
+    from .pipeline import run
+
+    config = Config()
+    for key, value in overrides:
+        setattr(config, key, value)
+
+    start = time.perf_counter()
+    try:
+        out = run(input_file, config)
+        return input_file, out, time.perf_counter() - start, None
+    except Exception as e:
+        return input_file, None, time.perf_counter() - start, f"{type(e).__name__}: {e}"
+
+
+def run_batch(inputs, cores, workers, force=False, overrides=()):
+    """
+    Process inputs across a process pool sized so that jobs x workers
+    stays within cores. Returns a list of (input, output, seconds, error).
+    """
+    overrides = [("NUM_WORKERS", workers)] + list(overrides)
+    results = []
+
+    todo = []
+    for path in inputs:
+        if not force and is_up_to_date(path):
+            results.append((path, existing_output(path), 0.0, UP_TO_DATE))
+        else:
+            todo.append(path)
+
+    jobs = max(1, min(len(todo), cores // max(1, workers)))
+    print(f"{len(todo)} to process, {len(results)} up to date; "
+          f"{jobs} job(s) x {workers} worker(s)")
+    if results and overrides[1:]:
+        print(f"--set does not apply to the {len(results)} up-to-date input(s); "
+              f"use --force to reprocess them with the new settings")
+
+    if jobs == 1:
+        done = (_process(path, overrides) for path in todo)
+        for result in done:
+            _print_result(result)
+            results.append(result)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as ex:
+            futures = [ex.submit(_process, path, overrides) for path in todo]
+            for future in concurrent.futures.as_completed(futures):
+                result = future.result()
+                _print_result(result)
+                results.append(result)
+
+    return results
+
+
+def _print_result(result):
+    path, out, seconds, error = result
+    status = error or f"-> {os.path.basename(out)}"
+    print(f"{seconds:8.1f}s  {path}  {status}", flush=True)
+
+
+def print_summary(results):
+    processed = [r for r in results if r[3] is None]
+    failed = [r for r in results if r[3] not in (None, UP_TO_DATE)]
+    skipped = len(results) - len(processed) - len(failed)
+
+    print("\nSummary")
+    for path, out, seconds, error in sorted(results):
+        print(f"  {seconds:8.1f}s  {path}  {error or 'ok'}")
+    total = sum(r[2] for r in processed)
+    print(f"{len(processed)} processed in {total:.1f}s of job time, "
+          f"{skipped} up to date, {len(failed)} failed")
+    if skipped:
+        print("Up-to-date inputs were skipped whatever their settings; "
+              "use --force to reprocess them")
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if not args.inputs:
+        from .io import select_input_file
+        from .pipeline import run
+
+        path = select_input_file()
+        out = run(path)
+        print(f"Saved to {out}")
+        return 0
+
+    missing = missing_inputs(args.inputs)
+    for path in missing:
+        print(f"No such file or directory: {path}", file=sys.stderr)
+
+    inputs = find_inputs(args.inputs, args.recursive, args.name)
+    if not inputs:
+        print("No input stacks found", file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    results = run_batch(inputs, args.cores, args.workers, args.force, args.overrides)
+    print_summary(results)
+    print(f"Wall time {time.perf_counter() - start:.1f}s")
+
+    failed = any(r[3] not in (None, UP_TO_DATE) for r in results)
+    return 1 if failed or missing else 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
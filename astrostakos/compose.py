@@ -0,0 +1,130 @@
+"""
+Fused, chunked evaluation of the stages after background estimation.
+
+Star separation, enhance_stars, stretch, the compose clip and sharpen
+each used to run as whole-image numpy expressions with several
+full-size float temporaries apiece. compose() evaluates the same
+arithmetic over row chunks small enough to stay in cache, in place on
+two preallocated full-size buffers. The global reductions (star
+luminance maximum and the stretch input range) are gathered by the
+first two passes, so no pass needs another full-image scan.
+The stretch and compose pass, whose chunks are independent, is spread
+over NUM_WORKERS threads.
+
+The per-chunk arithmetic lives in separate_chunk, enhance_chunk,
+compose_chunk and sharpen_rows, which streaming.run_streaming applies to
+its bands as well, so both paths stay bit-compatible.
+"""
+import numpy as np
+
+from .stars import star_luminance, adaptive_boost, stretch_curve, sharpen
+from .tracing import NULL_TRACER
+from .utils import map_threads
+
+# Target size of one chunk of a float64 buffer
+CHUNK_BYTES = 2 << 20
+# Rows of context sharpen needs on both sides of a chunk
+SHARPEN_HALO = 6  # sigma 1.2 GaussianBlur kernel radius (5)
+
+
+def chunk_rows(w, c):
+    """Rows per chunk for an HxWxC float64 buffer."""
+    return max(CHUNK_BYTES // (w * c * 8), 4 * SHARPEN_HALO)
+
+
+def _chunks(h, rows):
+    for y0 in range(0, h, rows):
+        yield y0, min(y0 + rows, h)
+
+
+def separate_chunk(img, background, star_mask, is_color, star_map, starless):
+    """
+    Split rows of img into star_map (stars above the background, under
+    the star mask) and starless = img - star_map, writing both in place.
+    Returns the star luminance maximum of the rows.
+    """
+    sm = np.subtract(img, background, out=star_map)
+    np.clip(sm, 0, 1, out=sm)
+    sm *= star_mask[..., None]
+    sm *= img > 0.01
+    np.subtract(img, sm, out=starless)
+    return float(star_luminance(sm, is_color).max())
+
+
+def enhance_chunk(sm, is_color, lum_max, config):
+    """Boost star_map rows sm in place by adaptive_boost, clipped to [0, 1]."""
+    sm *= adaptive_boost(star_luminance(sm, is_color), lum_max, config)[..., None]
+    return np.clip(sm, 0, 1, out=sm)
+
+
+def compose_chunk(sm, starless, curve):
+    """
+    Stretch enhanced star rows sm in place through curve and add them onto
+    starless, clipped to [0, 1]. Returns the composed rows (starless).
+    """
+    sm = curve(sm, out=sm)
+    starless += sm
+    return np.clip(starless, 0, 1, out=starless)
+
+
+def sharpen_rows(composed, y0, y1, scale=1.0):
+    """Sharpened rows y0:y1 of composed, using SHARPEN_HALO rows of context."""
+    h, w = composed.shape[:2]
+    e0, e1 = max(0, y0 - SHARPEN_HALO), min(h, y1 + SHARPEN_HALO)
+    # GaussianBlur drops the channel axis of single-channel input
+    return sharpen(composed[e0:e1], scale)[y0 - e0:y1 - e0].reshape(y1 - y0, w, -1)
+
+
+def compose(img, star_mask, background, is_color, config, report=None, scale=1.0,
+            tracer=NULL_TRACER, sink=None):
+    """
+    Separate stars from the background, enhance, stretch, recompose and
+    sharpen. Returns the final HxWxC float64 result in [0, 1].
+
+    scale: resolution of img relative to the full image (previews).
+    sink: optional callable receiving the final rows chunk by chunk, top
+          to bottom, as soon as they are ready (e.g. TiffOutput.write).
+    """
+    report = report or (lambda frac, msg=None: None)
+    h, w, c = img.shape
+    chunks = list(_chunks(h, chunk_rows(w, c)))
+
+    # star_map is enhanced, then stretched, in place and finally receives
+    # the sharpened result; starless becomes the composed image
+    star_map = np.empty((h, w, c), np.float64)
+    starless = np.empty((h, w, c), np.float64)
+
+    report(0.67, "Separating stars")
+    lum_max = 0.0
+    with tracer.span("separate_stars", img=img):
+        for y0, y1 in chunks:
+            lum_max = max(lum_max, separate_chunk(
+                img[y0:y1], background[y0:y1], star_mask[y0:y1], is_color,
+                star_map[y0:y1], starless[y0:y1]))
+
+    report(0.75, "Enhancing stars")
+    lo, hi = np.inf, -np.inf
+    with tracer.span("enhance_stars", star_map=star_map):
+        for y0, y1 in chunks:
+            sm = enhance_chunk(star_map[y0:y1], is_color, lum_max, config)
+            lo, hi = min(lo, sm.min()), max(hi, sm.max())
+
+    report(0.85, "Stretching")
+    # arcsinh is monotonic, so the stretched range follows from lo and hi
+    curve = stretch_curve(lo, hi, config)
+
+    def stretch_and_compose(chunk):
+        y0, y1 = chunk
+        compose_chunk(star_map[y0:y1], starless[y0:y1], curve)
+
+    with tracer.span("stretch", star_map=star_map):
+        map_threads(stretch_and_compose, chunks, config.NUM_WORKERS)
+
+    report(0.90, "Sharpening & composing")
+    with tracer.span("sharpen", starless=starless):
+        for y0, y1 in chunks:
+            star_map[y0:y1] = sharpen_rows(starless, y0, y1, scale)
+            if sink:
+                sink(star_map[y0:y1])
+
+    return star_map
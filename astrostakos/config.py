@@ -1,13 +1,37 @@
 class Config:
     """Configuration parameters for star enhancement"""
     BG_KERNEL = 75
+    BG_MODE = "tiled"  # "tiled" or "multires"
+    BG_DOWNSAMPLE = 4
     THRESH_SIGMA = 3.0
     STRETCH_STRENGTH = 10.0
     NUM_WORKERS = 8
+    BG_EXECUTOR = "threads"  # "threads", "processes" or "serial"
     BLOCK_SIZE = 512
     OVERLAP = 150
     ENHANCE_FACTOR = 1.3
     DIM_STAR_BOOST = 3.5
     BRIGHT_STAR_THRESHOLD = 0.3
     GAMMA = 2.2
+    APPLY_GAMMA = False  # apply 1/GAMMA to the stretched stars
+    STRETCH_LUT_BITS = 18  # stretch through a 2**bits lookup table; 0 evaluates it in float
     USE_CIRCULAR_KERNEL = True
+    HOT_PIXEL_SIGMA = "std"  # "std" or "mad" (sampled robust sigma)
+    DEFECT_MAPS = False  # remember hot pixels per camera between sessions
+    DEFECT_MAP_DIR = None  # defaults to ~/.astrostakos/defects
+    DEFECT_MIN_SESSIONS = 2
+    DEFECT_RESCAN = 5  # full scan every Nth new session to keep a confirmed map current
+    FILTER_BACKEND = "auto"  # "auto" (cv2 where supported) or "scipy"
+    STAR_CATALOG = None  # "csv" or "npz" to save the star catalog next to the output
+    STAGE_CACHE = False  # reuse early-stage arrays across runs on the same input
+    STAGE_CACHE_DIR = None  # defaults to ~/.astrostakos/cache
+    STAGE_CACHE_MB = 8192
+    STREAMING = False  # process in row bands within STREAM_MEMORY_MB
+    STREAM_MEMORY_MB = 2048  # tiled BG_MODE needs ~(2*BLOCK_SIZE+20)*width*channels*64 bytes
+    STREAM_TMPDIR = None  # spill directory for streaming mode (system temp if None)
+    OUTPUT_FORMAT = None  # "tiff" or "fits"; None follows the input file
+    OUTPUT_COMPRESSION = None  # "zlib" or "zstd": tiled output compressed while composing
+    OUTPUT_TILE = 512  # tile side of compressed output (multiple of 16)
+    OUTPUT_PYRAMID = 0  # half-resolution preview levels embedded in the output
+    TRACE = False  # write a Chrome trace and stage summary next to the output
+    TRACE_MEMORY = False  # also count allocations with tracemalloc (slow)
@@ -0,0 +1,218 @@
+"""
+Persistent sensor defect maps.
+
+Hot pixels are a fixed property of a sensor, so the pixels flagged by
+remove_hot_pixels are remembered per camera (make, model and image size)
+in small .npz files. Each input stack counts as one session only once,
+however often it is re-run. A pixel becomes a confirmed defect once it
+has been flagged in DEFECT_MIN_SESSIONS sessions and in at least half of
+all scanned sessions; stars move between sessions and never accumulate
+enough hits. Once a map is confirmed, later sessions replace just the
+listed pixels with their 3x3 median instead of scanning the whole
+frame, except that every DEFECT_RESCAN-th new session is scanned in full
+so new defects are picked up and false positives fall out.
+"""
+import hashlib
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+
+from .preprocessing import remove_hot_pixels
+
+# Extensions of the individual frames a stack may sit next to
+_FRAME_EXTS = (".dng", ".jpg", ".jpeg", ".png", ".fits", ".fit")
+
+# Share of scanned sessions a confirmed defect must have been flagged in
+_MIN_HIT_FRACTION = 0.5
+
+
+def _camera_props(path):
+    # dss is only needed when defect maps are enabled
+    from dss.image_props import get_image_properties
+
+    props = get_image_properties(path)
+    make, model = props.get("Make"), props.get("Device")
+    return (make, model) if make or model else None
+
+
+def camera_id(input_file):
+    """
+    (make, model) of the camera behind input_file, read from its own EXIF
+    or, for stacks without camera tags, from a frame in the same folder.
+    Returns None when the camera is unknown.
+    """
+    ident = _camera_props(input_file)
+    if ident:
+        return ident
+
+    folder = Path(input_file).parent
+    for entry in sorted(os.scandir(folder), key=lambda e: e.name):
+        if entry.is_file() and Path(entry.name).suffix.lower() in _FRAME_EXTS:
+            ident = _camera_props(entry.path)
+            if ident:
+                return ident
+    return None
+
+
+def default_map_dir():
+    return Path.home() / ".astrostakos" / "defects"
+
+
+def _slug(camera):
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", " ".join(filter(None, camera))).strip("_")
+    return slug or "unknown"
+
+
+def map_state(input_file, config):
+    """
+    Fingerprint of the defect maps clean_hot_pixels would consult for
+    input_file (name, size and mtime of every map of its camera), for
+    cache keys of results derived from the cleaned image. None when
+    defect maps are off or the camera is unknown.
+    """
+    if not config.DEFECT_MAPS:
+        return None
+    camera = camera_id(input_file)
+    if camera is None:
+        return None
+
+    # The image shape is only known once it is loaded, so all shapes count
+    directory = Path(config.DEFECT_MAP_DIR or default_map_dir())
+    name = re.compile(re.escape(_slug(camera)) + r"_\d+(x\d+)*\.npz")
+    try:
+        entries = [e for e in os.scandir(directory) if name.fullmatch(e.name)]
+    except OSError:
+        entries = []
+    return sorted(
+        (e.name, e.stat().st_size, e.stat().st_mtime_ns) for e in entries
+    )
+
+
+def input_id(input_file):
+    """Identity of one version of an input file (path, size and mtime)."""
+    st = os.stat(input_file)
+    key = f"{os.path.abspath(input_file)}|{st.st_size}|{st.st_mtime_ns}"
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+class DefectMap:
+    """
+    Per-pixel hit counts of one camera at one image shape.
+
+    sessions counts the fully scanned sessions behind hits, unscanned the
+    sessions repaired from the map since the last scan, and inputs the
+    input_id of every session counted so far.
+    """
+
+    def __init__(self, shape, sessions=0, pixels=None, hits=None, inputs=(),
+                 unscanned=0):
+        self.shape = tuple(shape)
+        self.sessions = sessions
+        self.pixels = np.zeros(0, np.int64) if pixels is None else pixels
+        self.hits = np.zeros(0, np.int32) if hits is None else hits
+        self.inputs = set(inputs)
+        self.unscanned = unscanned
+
+    @staticmethod
+    def path_for(directory, camera, shape):
+        dims = "x".join(str(n) for n in shape)
+        return Path(directory) / f"{_slug(camera)}_{dims}.npz"
+
+    @classmethod
+    def load(cls, path, shape):
+        # Maps without input identities may have counted re-runs as
+        # sessions, so they are started afresh like unreadable ones
+        try:
+            with np.load(path) as f:
+                if tuple(f["shape"]) != tuple(shape):
+                    return cls(shape)
+                return cls(shape, int(f["sessions"]), f["pixels"], f["hits"],
+                           f["inputs"].tolist(), int(f["unscanned"]))
+        except (OSError, KeyError, ValueError):
+            return cls(shape)
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp.npz")
+        np.savez_compressed(tmp, shape=np.array(self.shape), sessions=self.sessions,
+                            pixels=self.pixels, hits=self.hits,
+                            inputs=np.array(sorted(self.inputs), dtype=str),
+                            unscanned=self.unscanned)
+        os.replace(tmp, path)
+
+    def update(self, mask, ident):
+        """Count one more scanned session with mask as its flagged pixels."""
+        flagged = np.flatnonzero(mask)
+        pixels = np.union1d(self.pixels, flagged)
+        hits = np.zeros(len(pixels), np.int32)
+        hits[np.searchsorted(pixels, self.pixels)] += self.hits
+        hits[np.searchsorted(pixels, flagged)] += 1
+        self.pixels, self.hits = pixels, hits
+        self.sessions += 1
+        self.unscanned = 0
+        self.inputs.add(ident)
+
+    def is_confirmed(self, min_sessions):
+        return self.sessions >= min_sessions
+
+    def confirmed(self, min_sessions):
+        needed = max(min_sessions, _MIN_HIT_FRACTION * self.sessions)
+        return self.pixels[self.hits >= needed]
+
+
+def apply_defects(img, pixels):
+    """
+    Replace the flat (row-major, img.shape) indices in pixels with the 3x3
+    median of their channel, using edge replication like cv2.medianBlur.
+    """
+    cleaned = img.copy()
+    if len(pixels) == 0:
+        return cleaned
+
+    coords = np.unravel_index(pixels, img.shape)
+    h, w = img.shape[:2]
+    ys = np.clip(coords[0][:, None] + np.repeat([-1, 0, 1], 3), 0, h - 1)
+    xs = np.clip(coords[1][:, None] + np.tile([-1, 0, 1], 3), 0, w - 1)
+    rest = tuple(c[:, None] for c in coords[2:])
+
+    cleaned[coords] = np.median(img[(ys, xs) + rest], axis=1)
+    return cleaned
+
+
+def clean_hot_pixels(img, input_file, config):
+    """
+    Hot pixel removal for pipeline.run, backed by a defect map when
+    config.DEFECT_MAPS is set and the camera can be identified.
+    """
+    if not config.DEFECT_MAPS:
+        return remove_hot_pixels(img, estimator=config.HOT_PIXEL_SIGMA)
+
+    camera = camera_id(input_file)
+    if camera is None:
+        return remove_hot_pixels(img, estimator=config.HOT_PIXEL_SIGMA)
+
+    path = DefectMap.path_for(config.DEFECT_MAP_DIR or default_map_dir(),
+                              camera, img.shape)
+    defects = DefectMap.load(path, img.shape)
+    ident = input_id(input_file)
+    seen = ident in defects.inputs
+
+    if defects.is_confirmed(config.DEFECT_MIN_SESSIONS):
+        if seen:
+            return apply_defects(img, defects.confirmed(config.DEFECT_MIN_SESSIONS))
+        if defects.unscanned + 1 < config.DEFECT_RESCAN:
+            defects.unscanned += 1
+            defects.inputs.add(ident)
+            defects.save(path)
+            return apply_defects(img, defects.confirmed(config.DEFECT_MIN_SESSIONS))
+
+    cleaned, mask = remove_hot_pixels(
+        img, estimator=config.HOT_PIXEL_SIGMA, return_mask=True
+    )
+    if not seen:
+        defects.update(mask, ident)
+        defects.save(path)
+    return cleaned
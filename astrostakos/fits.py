@@ -0,0 +1,290 @@
+"""
+Minimal FITS support for single-image stacks (primary HDU only).
+
+Data is memory-mapped in its on-disk big-endian layout and converted to
+native physical values (BSCALE/BZERO applied) one row band at a time,
+so a stack is never duplicated in memory. Colour cubes are stored as
+planes (NAXIS3) and exposed channel-last like the TIFF loaders.
+"""
+import datetime
+import os
+import warnings
+
+import numpy as np
+
+FITS_EXTS = (".fits", ".fit", ".fts")
+
+BLOCK = 2880
+CARD = 80
+
+_BITPIX_DTYPES = {8: ">u1", 16: ">i2", 32: ">i4", 64: ">i8", -32: ">f4", -64: ">f8"}
+
+
+def is_fits(path):
+    return os.path.splitext(path)[1].lower() in FITS_EXTS
+
+
+def _parse_value(text):
+    text = text.strip()
+    if text.startswith("'"):
+        # Quotes inside strings are doubled
+        end = text.find("'", 1)
+        while end != -1 and text[end + 1:end + 2] == "'":
+            end = text.find("'", end + 2)
+        return text[1:end].replace("''", "'").rstrip()
+    text = text.split("/", 1)[0].strip()
+    if not text:
+        return None
+    if text in ("T", "F"):
+        return text == "T"
+    try:
+        return int(text)
+    except ValueError:
+        return float(text.replace("D", "E"))
+
+
+def read_header(path):
+    """
+    Parse the primary header of path. Returns (header, data_offset) where
+    header maps keywords to values; HISTORY and COMMENT cards are
+    collected into lists.
+    """
+    header = {}
+    offset = 0
+    last = None  # keyword of the previous valued card, for CONTINUE
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(BLOCK)
+            if len(block) < BLOCK:
+                raise ValueError(f"{path}: truncated FITS header")
+            offset += BLOCK
+            for i in range(0, BLOCK, CARD):
+                card = block[i:i + CARD].decode("ascii", "replace")
+                key = card[:8].strip()
+                if key == "END":
+                    if header.get("SIMPLE") is not True:
+                        raise ValueError(f"{path}: not a FITS file")
+                    return header, offset
+                if key in ("HISTORY", "COMMENT"):
+                    header.setdefault(key, []).append(card[8:].rstrip())
+                elif key == "CONTINUE":
+                    # Long-string convention: a value ending in & goes on
+                    value = header.get(last)
+                    if isinstance(value, str) and value.endswith("&"):
+                        header[last] = value[:-1] + (_parse_value(card[8:]) or "")
+                elif key == "HIERARCH" and "=" in card:
+                    name, value = card[9:].split("=", 1)
+                    last = name.strip()
+                    header[last] = _parse_value(value)
+                elif card[8:10] == "= ":
+                    last = key
+                    header[key] = _parse_value(card[10:])
+            if offset == BLOCK and header.get("SIMPLE") is not True:
+                raise ValueError(f"{path}: not a FITS file")
+
+
+class FitsImage:
+    """
+    Read-only HxW or HxWxC view of a FITS primary image. Indexing rows
+    returns native-endian physical values for just those rows.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.header, offset = read_header(path)
+        naxis = self.header.get("NAXIS", 0)
+        if naxis not in (2, 3):
+            raise ValueError(f"{path}: expected a 2D or 3D image, got NAXIS={naxis}")
+        # FITS axes run fastest first: (NAXIS3, NAXIS2, NAXIS1) = (C, H, W)
+        dims = [self.header[f"NAXIS{i}"] for i in range(naxis, 0, -1)]
+        self.bscale = self.header.get("BSCALE", 1)
+        self.bzero = self.header.get("BZERO", 0)
+        raw = np.memmap(path, dtype=_BITPIX_DTYPES[self.header["BITPIX"]], mode="r",
+                        offset=offset, shape=tuple(dims))
+        # Zero-copy channel-last view of the planar cube
+        self._raw = np.moveaxis(raw, 0, -1) if naxis == 3 else raw
+        self.shape = self._raw.shape
+        self.ndim = self._raw.ndim
+        self.dtype = self._physical_dtype()
+
+    def _physical_dtype(self):
+        raw = self._raw.dtype.newbyteorder("=")
+        if self.bscale == 1 and self.bzero == 0:
+            return raw
+        if raw.kind == "i" and self.bscale == 1 and self.bzero == 2 ** (raw.itemsize * 8 - 1):
+            return np.dtype(f"u{raw.itemsize}")  # unsigned integer convention
+        return np.dtype(np.float32 if raw.itemsize <= 2 else np.float64)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, rows):
+        return self.read(rows)
+
+    def read(self, rows, dtype=None):
+        """Physical values of raw[rows] as a native array of dtype."""
+        raw = self._raw[rows]
+        dtype = np.dtype(dtype or self.dtype)
+        if dtype.kind == "u" and self.dtype.kind == "u":
+            # Unsigned convention: flipping the sign bit subtracts BZERO
+            signed = raw.astype(raw.dtype.newbyteorder("="))
+            out = signed.view(self.dtype) ^ self.dtype.type(self.bzero)
+            return out.astype(dtype, copy=False)
+        out = raw.astype(dtype)
+        if self.bscale != 1:
+            out *= self.bscale
+        if self.bzero:
+            out += self.bzero
+        return out
+
+
+def config_cards(config):
+    """HIERARCH cards recording every Config field of config."""
+    from .config import Config
+
+    return {
+        f"ASTROSTAKOS {k}": getattr(config, k)
+        for k in dir(Config) if k.isupper()
+    }
+
+
+def _format_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return f"{'T' if value else 'F':>20}"
+    if isinstance(value, (int, np.integer)):
+        return f"{value:>20d}"
+    if isinstance(value, (float, np.floating)):
+        return f"{repr(float(value)).upper():>20}"
+    text = str(value).replace("'", "''")
+    return f"'{text:<8}'"
+
+
+def _card(key, value=None, comment=None):
+    """
+    One or more 80-character cards for key. Strings too long for one card
+    are split over CONTINUE cards; ValueError is raised when key and
+    value cannot be represented at all.
+    """
+    if key in ("HISTORY", "COMMENT"):
+        prefix, text = f"{key:<8}", str(value)
+    elif len(key) > 8 or " " in key:
+        prefix, text = f"HIERARCH {key} = ", _format_value(value).strip()
+    else:
+        prefix, text = f"{key:<8}= ", _format_value(value)
+        if comment:
+            text += f" / {comment}"
+    if len(prefix) + len(text) <= CARD:
+        return (prefix + text).ljust(CARD).encode("ascii")
+    if not isinstance(value, str) or key in ("HISTORY", "COMMENT"):
+        raise ValueError(f"FITS card too long: {prefix + text!r}")
+
+    # Each piece ends in & inside its quotes; a doubled quote is never split
+    room = CARD - len(prefix) - 3
+    if room < 1:
+        raise ValueError(f"FITS keyword too long: {key!r}")
+    pieces, piece = [], ""
+    for ch in value:
+        ch = "''" if ch == "'" else ch
+        if len(piece) + len(ch) > room:
+            pieces.append(piece)
+            piece, room = "", CARD - len("CONTINUE  '&'")
+        piece += ch
+    pieces.append(piece)
+    cards = [f"{prefix}'{pieces[0]}&'"]
+    cards += [f"CONTINUE  '{p}&'" for p in pieces[1:-1]]
+    cards.append(f"CONTINUE  '{pieces[-1]}'")
+    return b"".join(c.ljust(CARD).encode("ascii") for c in cards)
+
+
+def _header_bytes(cards):
+    data = b"".join(cards) + b"END".ljust(CARD)
+    return data.ljust(-(-len(data) // BLOCK) * BLOCK, b" ")
+
+
+class FitsOutput:
+    """
+    Incremental 16-bit FITS writer with the same write()/close()
+    interface as io.TiffOutput. Rows are converted to the unsigned
+    convention (BITPIX 16, BZERO 32768) band by band straight into a
+    memory map of the file. extra maps keywords to values added to the
+    header (see config_cards).
+    """
+
+    def __init__(self, out_path, shape, extra=None, history=()):
+        self.out_path = out_path
+        h, w = shape[:2]
+        c = shape[2] if len(shape) == 3 else 1
+        self.shape = (h, w, c)
+
+        cards = [
+            _card("SIMPLE", True, "conforms to FITS standard"),
+            _card("BITPIX", 16),
+            _card("NAXIS", 3 if c > 1 else 2),
+            _card("NAXIS1", w),
+            _card("NAXIS2", h),
+        ]
+        if c > 1:
+            cards.append(_card("NAXIS3", c))
+        cards += [
+            _card("BZERO", 32768, "unsigned 16-bit data"),
+            _card("BSCALE", 1),
+            _card("CREATOR", "astrostakos"),
+            _card("DATE", datetime.datetime.now(datetime.timezone.utc)
+                  .strftime("%Y-%m-%dT%H:%M:%S"), "file creation date (UTC)"),
+        ]
+        for k, v in (extra or {}).items():
+            # Metadata that cannot be recorded must not fail the run
+            try:
+                cards.append(_card(k, v))
+            except (ValueError, UnicodeEncodeError) as e:
+                warnings.warn(f"Skipping FITS header card {k}: {e}", RuntimeWarning)
+        cards += [_card("HISTORY", line) for line in history]
+        header = _header_bytes(cards)
+
+        data_bytes = h * w * c * 2
+        with open(out_path, "wb") as f:
+            f.write(header)
+            f.truncate(len(header) + -(-data_bytes // BLOCK) * BLOCK)
+        self._mm = np.memmap(out_path, dtype=">i2", mode="r+", offset=len(header),
+                             shape=(c, h, w))
+        self._out = np.moveaxis(self._mm, 0, -1)
+        self._rows = 0
+
+    def write(self, band):
+        """
+        Store the next rows (HxW or HxWxC floats in [0, 1]). Channels are
+        written as planes in the order the input was loaded in; unlike
+        the TIFF outputs there is no cv2 BGR/RGB swap.
+        """
+        h, w, c = self.shape
+        rows = (np.clip(band, 0, 1) * 65535).astype(np.uint16).reshape(-1, w, c)
+        y0, self._rows = self._rows, self._rows + len(rows)
+        self._out[y0:self._rows] = (rows ^ np.uint16(0x8000)).view(np.int16)
+
+    def close(self):
+        """Flush the file and return its path."""
+        if self._mm is None:
+            return self.out_path
+        if self._rows != self.shape[0]:
+            self.abort()
+            raise ValueError(f"{self._rows} of {self.shape[0]} rows written")
+        self._mm.flush()
+        self._mm = self._out = None
+        return self.out_path
+
+    def abort(self):
+        """Remove the partial file."""
+        self._mm = self._out = None
+        if os.path.exists(self.out_path):
+            os.remove(self.out_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
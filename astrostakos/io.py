@@ -1,18 +1,27 @@
-import cv2
 import numpy as np
 import os
-import tkinter as tk
-import tifffile as tiff
-from tkinter import filedialog, messagebox
+import queue
+import threading
+
+from .utils import map_threads
+from .fits import FitsImage, FitsOutput, is_fits, config_cards
+
+# cv2, tifffile and tkinter are imported on first use so that importing
+# the package stays fast and headless runs never load tkinter
 
 
 def select_input_file():
+    import tkinter as tk
+    from tkinter import filedialog, messagebox
+
     root = tk.Tk()
     root.withdraw()
 
     path = filedialog.askopenfilename(
         title="Select Autosave.tif",
-        filetypes=[("TIFF files", "*.tif *.tiff")]
+        filetypes=[("Stacked images", "*.tif *.tiff *.fits *.fit *.fts"),
+                   ("TIFF files", "*.tif *.tiff"),
+                   ("FITS files", "*.fits *.fit *.fts")]
     )
 
     if not path:
@@ -26,29 +35,338 @@ def select_input_file():
     return path
 
 
+# Approximate bytes of float32 output converted per chunk
+_LOAD_CHUNK_BYTES = 4 << 20
+
 
-def load_image(filepath):
-    img = tiff.imread(filepath)
+def load_image(filepath, workers=None):
+    """
+    Load a TIFF or FITS image as float32, divided by its maximum when
+    that is above 1.5.
 
-    if img is None:
+    Uncompressed TIFFs and FITS files are converted straight from a
+    memory map and compressed TIFFs are decoded tile by tile (or strip by
+    strip) on `workers` threads, each converting its segment into the
+    output and taking its maximum on the way, so no integer copy of the
+    image is ever held and the maximum costs no extra pass.
+    """
+    if not os.path.isfile(filepath):
         raise FileNotFoundError(filepath)
+    workers = workers or os.cpu_count() or 1
 
-    img = img.astype(np.float32)
+    if is_fits(filepath):
+        img, maxv = _convert_rows(FitsImage(filepath), workers)
+    else:
+        img, maxv = _load_tiff(filepath, workers)
 
     # Normalize safely
-    maxv = img.max()
     if maxv > 1.5:
-        img /= maxv
+        _rows_map(lambda sl: np.divide(img[sl], maxv, out=img[sl]), img, workers)
 
     return img
 
 
-def save_output(rgb_result, input_file, num_stars):
+def _load_tiff(filepath, workers):
+    import tifffile as tiff
+
+    with tiff.TiffFile(filepath) as tif:
+        page = tif.pages.first
+        single = len(tif.series[0].pages) == 1 and tif.series[0].shape == page.shape
+        contig = page.samplesperpixel == 1 or page.planarconfig == tiff.PLANARCONFIG.CONTIG
+        if not (single and contig):
+            img = tif.asarray().astype(np.float32)
+            maxv = img.max()
+        elif page.is_memmappable:
+            img, maxv = _convert_rows(tiff.memmap(filepath, mode="r"), workers)
+        else:
+            img, maxv = _decode_segments(page, workers)
+    return img, maxv
+
+
+def _rows_map(fn, img, workers):
+    """Apply fn to row slices of img of about _LOAD_CHUNK_BYTES each."""
+    row_bytes = max(1, img[:1].size) * 4
+    rows = max(1, _LOAD_CHUNK_BYTES // row_bytes)
+    slices = [slice(y, y + rows) for y in range(0, len(img), rows)]
+    return map_threads(fn, slices, workers)
+
+
+def _convert_rows(src, workers):
+    img = np.empty(src.shape, np.float32)
+
+    def convert(sl):
+        img[sl] = src[sl]
+        return img[sl].max(initial=-np.inf)
+
+    return img, np.float32(max(_rows_map(convert, img, workers), default=0))
+
+
+def _decode_segments(page, workers):
+    img = np.empty(page.shape, np.float32)
+    h, w = page.imagelength, page.imagewidth
+    # Normalised layout: (separate sample, depth, length, width, contig sample)
+    out = img.reshape(page.shaped)
+
+    def convert(result):
+        segment, (s, d, y, x, _), (depth, length, width, _) = result
+        dst = out[s, d:d + depth, y:y + length, x:x + width]
+        if segment is None:
+            dst[...] = 0
+            return 0
+        # Tiles come back full size; crop those on the right/bottom edge
+        dst[...] = segment[:, :min(length, h - y), :min(width, w - x)]
+        return dst.max(initial=-np.inf)
+
+    maxima = page.segments(func=convert, maxworkers=workers,
+                           buffersize=_LOAD_CHUNK_BYTES * workers)
+    return img, np.float32(max(maxima, default=0))
+
+
+def open_image(filepath):
+    """
+    Open a TIFF or FITS image for band-wise reading without loading it
+    into memory. Uncompressed TIFFs are memory-mapped directly, compressed
+    ones are decoded once into a temporary memory-mapped file. FITS data
+    is memory-mapped and converted to native values per band read.
+    """
+    import tifffile as tiff
+
+    if not os.path.isfile(filepath):
+        raise FileNotFoundError(filepath)
+    if is_fits(filepath):
+        return FitsImage(filepath)
+    try:
+        return tiff.memmap(filepath, mode="r")
+    except ValueError:
+        return tiff.imread(filepath, out="memmap")
+
+
+def output_path(input_file, num_stars, ext=".tif"):
     # Better descriptive filename
     base_name = os.path.splitext(os.path.basename(input_file))[0]
-    out_name = f"{base_name}_stars_{num_stars}_enhanced.tif"
-    out_path = os.path.join(os.path.dirname(input_file), out_name)
+    out_name = f"{base_name}_stars_{num_stars}_enhanced{ext}"
+    return os.path.join(os.path.dirname(input_file), out_name)
+
+
+def output_ext(input_file, config):
+    """Output extension for config.OUTPUT_FORMAT (None follows the input)."""
+    fmt = config.OUTPUT_FORMAT or ("fits" if is_fits(input_file) else "tiff")
+    try:
+        return {"tiff": ".tif", "fits": ".fits"}[fmt]
+    except KeyError:
+        raise ValueError(f"Unknown OUTPUT_FORMAT: {fmt!r}") from None
+
+
+def open_output(out_path, shape, config):
+    """
+    Incremental writer (write(rows) / close()) for out_path, or None when
+    the result should go through save_output. FITS headers record every
+    Config field.
+    """
+    if is_fits(out_path):
+        return FitsOutput(out_path, shape, config_cards(config))
+    return TiffOutput.from_config(out_path, shape, config)
+
+
+def catalog_path(out_path, fmt):
+    """Star catalog sidecar path next to an output TIFF (fmt: "csv"/"npz")."""
+    return f"{os.path.splitext(out_path)[0]}_catalog.{fmt}"
+
+
+def create_output(out_path, shape):
+    """
+    Create a 16-bit TIFF on disk and return a writable memory map of it,
+    so results can be written band by band. 3-channel data is expected
+    in the same BGR order save_output receives.
+    """
+    import tifffile as tiff
+
+    photometric = "rgb" if len(shape) == 3 and shape[2] == 3 else "minisblack"
+    if len(shape) == 3 and shape[2] == 1:
+        shape = shape[:2]
+    out = tiff.memmap(out_path, shape=shape, dtype=np.uint16,
+                      photometric=photometric)
+    # cv2.imwrite stores BGR arrays as RGB; mirror that for memmapped output
+    return out[..., ::-1] if photometric == "rgb" else out.reshape(*shape, 1)
+
+
+def save_output(rgb_result, input_file, num_stars):
+    import cv2
+
+    out_path = output_path(input_file, num_stars)
 
     rgb_result = np.clip(rgb_result, 0, 1)
     cv2.imwrite(out_path, (rgb_result * 65535).astype(np.uint16))
     return out_path
+
+
+# Raw sizes above this are written as BigTIFF
+_BIGTIFF_BYTES = 2**32 - 2**25
+
+
+def _halve(rows, carry):
+    """2x2 box average of rows; an unpaired last row is returned as carry."""
+    if carry is not None:
+        rows = np.concatenate([carry, rows])
+    n = len(rows) // 2 * 2
+    w2 = rows.shape[1] // 2
+    blocks = rows[:n, :w2 * 2].reshape(n // 2, 2, w2, 2, *rows.shape[2:])
+    half = (blocks.sum(axis=(1, 3), dtype=np.uint32) + 2) // 4
+    return half.astype(np.uint16), (rows[n:] if n < len(rows) else None)
+
+
+class TiffOutput:
+    """
+    Incremental 16-bit TIFF writer with tiled layout, multithreaded
+    compression, BigTIFF for outputs over 4 GB and optional half-resolution
+    preview levels stored as SubIFDs.
+
+    Row bands of the [0, 1] result are passed to write() top to bottom in
+    the BGR order save_output receives. A background thread converts them,
+    cuts them into tiles and feeds tifffile, so encoding overlaps with the
+    caller computing the next band. Bands are read after write() returns
+    and must not be modified afterwards. Preview levels are accumulated in
+    memory (at most a third of the output size) and written on close().
+    """
+
+    def __init__(self, out_path, shape, compression=None, tile=512, pyramid=0,
+                 workers=None):
+        self.out_path = out_path
+        self.shape = tuple(shape)
+        h, w = self.shape[:2]
+        c = self.shape[2] if len(self.shape) == 3 else 1
+        self.photometric = "rgb" if c == 3 else "minisblack"
+        self._tile = (tile, tile)
+        self._options = {
+            "compression": compression,
+            "predictor": True if compression else None,
+            "photometric": self.photometric,
+            "metadata": None,
+            "maxworkers": workers,
+        }
+        self._bigtiff = h * w * c * 2 > _BIGTIFF_BYTES
+        self._levels = [
+            np.zeros((h >> k, w >> k) + ((c,) if c > 1 else ()), np.uint16)
+            for k in range(1, pyramid + 1) if min(h >> k, w >> k) > 0
+        ]
+        self._queue = queue.Queue(maxsize=2)
+        self._rows = 0
+        self._aborted = False
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_config(cls, out_path, shape, config):
+        """
+        Writer for config.OUTPUT_COMPRESSION / OUTPUT_PYRAMID, or for any
+        output too large for a classic TIFF; None when save_output suffices.
+        """
+        c = shape[2] if len(shape) == 3 else 1
+        large = shape[0] * shape[1] * c * 2 > _BIGTIFF_BYTES
+        if not (config.OUTPUT_COMPRESSION or config.OUTPUT_PYRAMID or large):
+            return None
+        return cls(out_path, shape, config.OUTPUT_COMPRESSION, config.OUTPUT_TILE,
+                   config.OUTPUT_PYRAMID, config.NUM_WORKERS)
+
+    def _convert(self, band):
+        rows = (np.clip(band, 0, 1) * 65535).astype(np.uint16)
+        rows = rows.reshape(len(rows), *self.shape[1:2], -1)
+        # cv2.imwrite stores BGR arrays as RGB; match save_output
+        return rows[..., ::-1] if self.photometric == "rgb" else rows[..., 0]
+
+    def _tiles(self):
+        th, tw = self._tile
+        w = self.shape[1]
+        buf, filled = None, 0
+        carries = [None] * len(self._levels)
+        level_rows = [0] * len(self._levels)
+
+        while True:
+            band = self._queue.get()
+            if band is None:
+                break
+            rows = self._convert(band)
+
+            # Preview levels: halve each level from the one above
+            half = rows
+            for k, level in enumerate(self._levels):
+                half, carries[k] = _halve(half, carries[k])
+                n = min(len(half), len(level) - level_rows[k])
+                level[level_rows[k]:level_rows[k] + n] = half[:n]
+                level_rows[k] += n
+
+            pos = 0
+            while pos < len(rows):
+                if buf is None:
+                    # A fresh buffer per tile row; tifffile may still hold
+                    # tiles of the previous one
+                    buf = np.empty((th,) + rows.shape[1:], np.uint16)
+                n = min(th - filled, len(rows) - pos)
+                buf[filled:filled + n] = rows[pos:pos + n]
+                filled, pos = filled + n, pos + n
+                if filled == th:
+                    for x in range(0, w, tw):
+                        yield buf[:, x:x + tw]
+                    buf, filled = None, 0
+
+        if filled and not self._aborted:
+            for x in range(0, w, tw):
+                yield buf[:filled, x:x + tw]
+
+    def _run(self):
+        import tifffile as tiff
+
+        try:
+            with tiff.TiffWriter(self.out_path, bigtiff=self._bigtiff) as tif:
+                shape = self.shape if self.photometric == "rgb" else self.shape[:2]
+                tif.write(self._tiles(), shape=shape, dtype=np.uint16, tile=self._tile,
+                          subifds=len(self._levels) or None, **self._options)
+                for level in self._levels:
+                    tif.write(level, tile=self._tile, subfiletype=1, **self._options)
+        except BaseException as e:
+            self._error = e
+            # Unblock a producer waiting on a full queue
+            while not self._queue.empty():
+                self._queue.get_nowait()
+
+    def _check(self):
+        if self._error is not None and not self._aborted:
+            raise self._error
+
+    def write(self, band):
+        """Queue the next rows (HxW or HxWxC floats in [0, 1])."""
+        self._check()
+        if not self._thread.is_alive():
+            raise RuntimeError("TiffOutput is closed")
+        self._rows += len(band)
+        self._queue.put(band)
+
+    def close(self):
+        """Finish the file and return its path."""
+        if self._rows != self.shape[0] and self._error is None:
+            self.abort()
+            raise ValueError(f"{self._rows} of {self.shape[0]} rows written")
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._check()
+        return self.out_path
+
+    def abort(self):
+        """Stop writing and remove the partial file."""
+        self._aborted = True
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if os.path.exists(self.out_path):
+            os.remove(self.out_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
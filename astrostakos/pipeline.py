@@ -1,10 +1,28 @@
-import numpy as np
-from scipy.ndimage import label
+import contextlib
+
 from .config import Config
-from .io import load_image, save_output, select_input_file
-from .preprocessing import remove_hot_pixels, prepare_channels
-from .background import estimate_background_tiled
-from .stars import detect_stars, enhance_stars, stretch, sharpen
+from .io import (
+    load_image, save_output, select_input_file, output_path, output_ext, open_output,
+    catalog_path,
+)
+from .preprocessing import prepare_channels
+from .defects import clean_hot_pixels, map_state
+from .background import estimate_background
+from .stars import detect_stars
+from .streaming import run_streaming
+from .catalog import StarCatalog
+from .stage_cache import StageCache
+from .compose import compose
+from .tracing import Tracer
+
+# Config fields read by each cacheable stage, including upstream stages
+HOT_PIXEL_FIELDS = (
+    "HOT_PIXEL_SIGMA", "DEFECT_MAPS", "DEFECT_MAP_DIR", "DEFECT_MIN_SESSIONS", "DEFECT_RESCAN"
+)
+STAR_FIELDS = HOT_PIXEL_FIELDS + ("THRESH_SIGMA", "USE_CIRCULAR_KERNEL", "FILTER_BACKEND")
+BACKGROUND_FIELDS = HOT_PIXEL_FIELDS + (
+    "BG_KERNEL", "BG_MODE", "BG_DOWNSAMPLE", "BLOCK_SIZE", "OVERLAP", "FILTER_BACKEND"
+)
 
 
 def run(input_file=None, config=None, on_progress=None):
@@ -28,63 +46,90 @@ def run(input_file=None, config=None, on_progress=None):
     if not input_file:
         return None
 
-    _report(0.05, "Loading image")
-    img = load_image(input_file)
-
-    _report(0.10, "Removing hot pixels")
-    img = remove_hot_pixels(img)
+    tracer = Tracer.from_config(config)
+    try:
+        return _run(input_file, config, _report, tracer)
+    finally:
+        tracer.close()
+
+
+def _run(input_file, config, _report, tracer):
+    """Body of run() once the input and tracer are settled."""
+    if config.STREAMING:
+        out = run_streaming(input_file, config, _report, tracer)
+        if tracer.enabled:
+            tracer.save(out)
+        return out
+
+    stage_cache = StageCache.from_config(config)
+    file_hash = stage_cache.file_hash(input_file) if stage_cache else None
+    # Every cached stage starts from the image cleaned with the defect
+    # maps as they are before this run
+    defects = map_state(input_file, config) if stage_cache else None
+
+    def cached(stage, fields, compute):
+        # compute() returns a dict of arrays; hits come back memory-mapped
+        if stage_cache is None:
+            return compute()
+        key = stage_cache.key(file_hash, stage, fields, config, defects)
+        with tracer.span("cache_lookup", stage=stage):
+            hit = stage_cache.get(key)
+        if hit is not None:
+            return hit
+        return stage_cache.put(key, compute())
+
+    def load_and_clean():
+        _report(0.05, "Loading image")
+        with tracer.span("load_image"):
+            img = load_image(input_file, config.NUM_WORKERS)
+        _report(0.10, "Removing hot pixels")
+        with tracer.span("clean_hot_pixels", img=img):
+            return {"img": clean_hot_pixels(img, input_file, config)}
+
+    img = cached("clean", HOT_PIXEL_FIELDS, load_and_clean)["img"]
 
     _report(0.15, "Preparing channels")
-    img, luminance, is_color = prepare_channels(img)
+    with tracer.span("prepare_channels", img=img):
+        img, luminance, is_color = prepare_channels(img)
     h, w, c = img.shape
 
-    _report(0.20, "Detecting stars")
-    star_mask = detect_stars(luminance, config)
-    _report(0.35, "Stars detected")
-
-    labeled_stars, num_stars = label(star_mask)
-
-    backgrounds = []
-    stars = []
-    starless = []
-
-    for i in range(c):
-        _report(0.36 + (i / max(1, c)) * 0.01, f"Channel {i+1}/{c}: preparing")
-        gated_mask = star_mask * (img[..., i] > 0.01)
-
-        # background estimation: allow progress per-tile
-        bg = estimate_background_tiled(
-            img[..., i],
-            config,
-            on_progress=(lambda p, msg=None, idx=i: on_progress and on_progress(0.35 + p * 0.30, f"Background ch {idx+1}/{c}: {msg}")) if on_progress else None
-        )
-        _report(0.36 + ((i + 1) / max(1, c)) * 0.30, f"Background ch {i+1}/{c} done")
-
-        star_signal = np.clip(img[..., i] - bg, 0, 1)
-
-        sm = star_signal * gated_mask
-        sl = img[..., i] - sm
-
-        backgrounds.append(bg)
-        stars.append(sm)
-        starless.append(sl)
-
-    _report(0.67, "Combining channels")
-    star_map = np.stack(stars, axis=-1)
-    starless = np.stack(starless, axis=-1)
-
-    _report(0.75, "Enhancing stars")
-    enhanced = enhance_stars(star_map, is_color, config)
-
-    _report(0.85, "Stretching")
-    stretched = stretch(enhanced, config.STRETCH_STRENGTH)
-
-    _report(0.90, "Sharpening & composing")
-    result = np.clip(starless + stretched, 0, 1)
-    result = sharpen(result)
-
-    _report(0.95, "Saving output")
-    out = save_output(result, input_file, num_stars)
+    def find_stars():
+        _report(0.20, "Detecting stars")
+        with tracer.span("detect_stars", luminance=luminance):
+            star_mask, catalog = detect_stars(luminance, config)
+        return {"star_mask": star_mask, "catalog": catalog.data}
+
+    stars = cached("stars", STAR_FIELDS, find_stars)
+    star_mask, catalog = stars["star_mask"], StarCatalog(stars["catalog"])
+    num_stars = len(catalog)
+    _report(0.35, f"{num_stars} stars detected")
+
+    def model_background():
+        _report(0.36, "Estimating background")
+        with tracer.span("estimate_background", img=img):
+            background = estimate_background(
+                img,
+                config,
+                on_progress=lambda p, msg=None: _report(0.36 + p * 0.30, f"Background: {msg}"),
+                tracer=tracer,
+            )
+        return {"background": background}
+
+    background = cached("background", BACKGROUND_FIELDS, model_background)["background"]
+
+    out = output_path(input_file, num_stars, output_ext(input_file, config))
+    writer = open_output(out, img.shape, config)
+    with writer or contextlib.nullcontext():
+        result = compose(img, star_mask, background, is_color, config, _report,
+                         tracer=tracer, sink=writer.write if writer else None)
+
+        _report(0.95, "Saving output")
+        with tracer.span("save_output", result=result):
+            out = writer.close() if writer else save_output(result, input_file, num_stars)
+    if config.STAR_CATALOG:
+        catalog.save(catalog_path(out, config.STAR_CATALOG))
+    if tracer.enabled:
+        tracer.save(out)
     _report(1.00, "Done")
 
     return out
@@ -1,25 +1,72 @@
 import cv2
 import numpy as np
 
+# Upper bound on residual samples used for the robust (MAD) sigma
+MAD_SAMPLES = 1_000_000
 
-def remove_hot_pixels(img, threshold_sigma=8.0):
-    if img.ndim == 2:
-        return _clean_channel(img, threshold_sigma)
 
-    cleaned = img.copy()
-    for c in range(3):
-        cleaned[..., c] = _clean_channel(img[..., c], threshold_sigma)
+def remove_hot_pixels(img, threshold_sigma=8.0, sigmas=None, estimator="std",
+                      return_mask=False):
+    """
+    Replace pixels standing more than threshold_sigma above their 3x3
+    median, all channels in one pass.
+
+    sigmas: optional per-channel spread of the median residual. When None
+            it is measured on img itself (streaming passes precompute it).
+    estimator: "std" (full standard deviation) or "mad" (robust sigma
+               from a strided sample, see residual_sigmas).
+    return_mask: also return the boolean mask of replaced pixels.
+    """
+    median, diff = hot_pixel_residual(img)
+    if sigmas is None:
+        sigmas = residual_sigmas(diff, estimator)
+
+    limit = threshold_sigma * np.asarray(sigmas, dtype=diff.dtype)
+    mask = diff > (limit[0] if img.ndim == 2 else limit)
+    cleaned = np.where(mask, median, img)
+
+    if return_mask:
+        return cleaned, mask
     return cleaned
 
 
-def _clean_channel(channel, sigma_thresh):
-    median = cv2.medianBlur(channel, 3)
-    diff = channel - median
-    sigma = np.std(diff)
-    mask = diff > (sigma_thresh * sigma)
-    channel = channel.copy()
-    channel[mask] = median[mask]
-    return channel
+def hot_pixel_residual(img):
+    """Return (median, img - median) for a 3x3 median of each channel."""
+    if img.ndim == 2 or img.shape[2] in (1, 3, 4):
+        median = cv2.medianBlur(np.ascontiguousarray(img), 3).reshape(img.shape)
+    else:
+        median = np.stack(
+            [cv2.medianBlur(np.ascontiguousarray(img[..., c]), 3)
+             for c in range(img.shape[2])],
+            axis=-1
+        )
+    return median, img - median
+
+
+def robust_sigma(x, samples=MAD_SAMPLES):
+    """
+    1.4826 x MAD of at most samples evenly strided values of x. On
+    quantized low-noise data most residuals are exactly 0 and the MAD
+    collapses to 0, so the sample's standard deviation is used instead.
+    """
+    flat = x.reshape(-1)
+    sample = flat[::max(1, flat.size // samples)]
+    mad = float(np.median(np.abs(sample - np.median(sample))))
+    return 1.4826 * mad if mad > 0 else float(np.std(sample))
+
+
+def residual_sigmas(diff, estimator="std"):
+    """Per-channel spread of a median residual."""
+    if estimator == "std":
+        measure = np.std
+    elif estimator == "mad":
+        measure = robust_sigma
+    else:
+        raise ValueError(f"Unknown HOT_PIXEL_SIGMA: {estimator!r}")
+
+    if diff.ndim == 2:
+        return [measure(diff)]
+    return [measure(diff[..., c]) for c in range(diff.shape[2])]
 
 
 def prepare_channels(img):
@@ -0,0 +1,97 @@
+"""
+Low-resolution proxy renders for interactive parameter tuning.
+
+preview() runs the same stage sequence as pipeline.run on a level of a
+cached image pyramid, with every filter sigma scaled to that level, so
+settings can be judged in a fraction of a second before committing to
+a full-resolution run.
+"""
+import copy
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+
+from .config import Config
+from .io import load_image
+from .preprocessing import remove_hot_pixels, prepare_channels
+from .background import estimate_background
+from .stars import detect_stars
+from .compose import compose
+
+# Number of input images whose pyramids are kept in memory
+PYRAMID_CACHE_SIZE = 2
+# Pyramids stop halving below this side length
+MIN_PYRAMID_SIDE = 128
+
+_pyramids = OrderedDict()
+_lock = threading.Lock()
+
+
+def _build_pyramid(img):
+    levels = [img]
+    while max(levels[-1].shape[:2]) // 2 >= MIN_PYRAMID_SIDE:
+        prev = levels[-1]
+        h, w = prev.shape[:2]
+        small = cv2.resize(prev, (w // 2, h // 2), interpolation=cv2.INTER_AREA)
+        levels.append(small.reshape(h // 2, w // 2, *prev.shape[2:]))
+    return levels
+
+
+def pyramid(input_file):
+    """
+    Halving image pyramid of input_file (level 0 is full resolution),
+    cached in memory and invalidated when the file changes.
+    """
+    st = os.stat(input_file)
+    key = (os.path.abspath(input_file), st.st_size, st.st_mtime_ns)
+
+    with _lock:
+        if key in _pyramids:
+            _pyramids.move_to_end(key)
+            return _pyramids[key]
+
+    levels = _build_pyramid(load_image(input_file))
+
+    with _lock:
+        _pyramids[key] = levels
+        while len(_pyramids) > PYRAMID_CACHE_SIZE:
+            _pyramids.popitem(last=False)
+    return levels
+
+
+def scaled_config(config, scale):
+    """Copy of config with its pixel-size parameters scaled by scale."""
+    scaled = copy.copy(config)
+    scaled.BG_KERNEL = config.BG_KERNEL * scale
+    scaled.BLOCK_SIZE = max(32, int(config.BLOCK_SIZE * scale))
+    scaled.OVERLAP = min(int(config.OVERLAP * scale), scaled.BLOCK_SIZE // 2)
+    scaled.BG_DOWNSAMPLE = max(1, int(config.BG_DOWNSAMPLE * scale))
+    return scaled
+
+
+def preview(input_file, config=None, max_side=1024):
+    """
+    Render input_file on the first pyramid level whose longer side is at
+    most max_side.
+
+    Returns (result, catalog): the HxWxC result in [0, 1] and the stars
+    found at that level, in level pixel coordinates.
+    """
+    config = config or Config()
+    levels = pyramid(input_file)
+    level = next(
+        (i for i, lvl in enumerate(levels) if max(lvl.shape[:2]) <= max_side),
+        len(levels) - 1
+    )
+    scale = 0.5 ** level
+    config = scaled_config(config, scale)
+
+    img = remove_hot_pixels(levels[level], estimator=config.HOT_PIXEL_SIGMA)
+    img, luminance, is_color = prepare_channels(img)
+
+    star_mask, catalog = detect_stars(luminance, config, scale=scale)
+    background = estimate_background(img, config)
+
+    return compose(img, star_mask, background, is_color, config, scale=scale), catalog
@@ -0,0 +1,126 @@
+"""
+Content-addressed on-disk cache of intermediate pipeline arrays.
+
+An entry is keyed by the SHA-256 of the input file plus the values of
+only those Config fields the stage (and its upstream stages) read, and
+any other state they depend on (e.g. the defect maps), so
+re-running with tweaked late-stage parameters hits every early stage.
+Arrays are stored as .npy files and loaded memory-mapped, which makes
+hits zero-copy. Entries are evicted least recently used first once the
+cache grows beyond its size cap.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+_HASH_CHUNK = 16 * 1024 * 1024
+
+
+def default_cache_dir():
+    return Path.home() / ".astrostakos" / "cache"
+
+
+class StageCache:
+    def __init__(self, directory, max_bytes):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config):
+        """StageCache for config, or None when config.STAGE_CACHE is off."""
+        if not config.STAGE_CACHE:
+            return None
+        return cls(config.STAGE_CACHE_DIR or default_cache_dir(),
+                   config.STAGE_CACHE_MB * 1024 ** 2)
+
+    def file_hash(self, path):
+        """
+        SHA-256 of the file contents, memoized by path, size and mtime so
+        unchanged inputs are not re-read on every run.
+        """
+        st = os.stat(path)
+        memo_key = hashlib.sha256(
+            f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}".encode()
+        ).hexdigest()
+        memo = self.directory / "hashes" / memo_key
+        try:
+            return memo.read_text().strip()
+        except OSError:
+            pass
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+                digest.update(chunk)
+        result = digest.hexdigest()
+
+        memo.parent.mkdir(exist_ok=True)
+        memo.write_text(result)
+        return result
+
+    @staticmethod
+    def key(file_hash, stage, fields, config, state=None):
+        """
+        Key of stage's output. state: any further JSON-serialisable inputs
+        the stage depends on besides the file and fields.
+        """
+        params = {name: getattr(config, name) for name in sorted(fields)}
+        blob = json.dumps([file_hash, stage, params, state], sort_keys=True, default=str)
+        return f"{stage}-{hashlib.sha256(blob.encode()).hexdigest()[:32]}"
+
+    def get(self, key):
+        """Dict of read-only memory-mapped arrays, or None on a miss."""
+        entry = self.directory / key
+        if not entry.is_dir():
+            return None
+        try:
+            arrays = {
+                p.stem: np.load(p, mmap_mode="r")
+                for p in entry.glob("*.npy")
+            }
+        except (OSError, ValueError):
+            shutil.rmtree(entry, ignore_errors=True)
+            return None
+        os.utime(entry)
+        return arrays
+
+    def put(self, key, arrays):
+        """Store a dict of arrays under key and return it unchanged."""
+        entry = self.directory / key
+        tmp = Path(tempfile.mkdtemp(prefix=".tmp-", dir=self.directory))
+        try:
+            for name, arr in arrays.items():
+                np.save(tmp / f"{name}.npy", np.asarray(arr))
+            if entry.exists():
+                shutil.rmtree(entry, ignore_errors=True)
+            os.replace(tmp, entry)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+            return arrays
+
+        self._evict(keep=entry)
+        return arrays
+
+    def _entries(self):
+        for entry in self.directory.iterdir():
+            if entry.is_dir() and entry.name != "hashes" \
+                    and not entry.name.startswith(".tmp-"):
+                size = sum(p.stat().st_size for p in entry.glob("*.npy"))
+                yield entry.stat().st_mtime, size, entry
+
+    def _evict(self, keep):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            if entry == keep:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
@@ -1,7 +1,7 @@
 import numpy as np
 import cv2
-from scipy.ndimage import gaussian_filter
-from skimage import exposure
+from .catalog import StarCatalog
+from .filters import gaussian, scaled_sigma
 
 
 def create_circular_kernel(radius):
@@ -13,16 +13,35 @@ def create_circular_kernel(radius):
     return kernel
 
 
-def detect_stars(channel, config):
-    g_small = gaussian_filter(channel, 1.0)
-    g_large = gaussian_filter(channel, 4.0)
-    hp = g_small - g_large
+def _star_blurs(channel, backend, scale):
+    """(sigma 1 blur, difference-of-Gaussians high-pass) of channel."""
+    g_small = gaussian(channel, scaled_sigma(1.0, scale), backend)
+    return g_small, g_small - gaussian(channel, scaled_sigma(4.0, scale), backend)
 
-    threshold = config.THRESH_SIGMA * np.std(hp)
+
+def star_highpass(channel, backend="auto", scale=1.0):
+    """Difference of Gaussians used to pick out star-sized features."""
+    return _star_blurs(channel, backend, scale)[1]
+
+
+def detect_stars(channel, config, threshold=None, scale=1.0):
+    """
+    threshold: optional high-pass cut. Defaults to THRESH_SIGMA times the
+               std of the high-pass image of channel.
+    scale: resolution of channel relative to the full image (previews);
+           filter sigmas and the minimum star area shrink with it.
+
+    Returns (mask, catalog): the soft star mask and a StarCatalog of the
+    components kept in it.
+    """
+    # The sigma 1 blur doubles as the local mean of the chromatic test
+    g_small, hp = _star_blurs(channel, config.FILTER_BACKEND, scale)
+
+    if threshold is None:
+        threshold = config.THRESH_SIGMA * np.std(hp)
     binary = hp > threshold
 
-    local_mean = gaussian_filter(channel, 1.0)
-    chromatic_ratio = channel / (local_mean + 1e-10)
+    chromatic_ratio = channel / (g_small + 1e-10)
     binary &= chromatic_ratio < 2.5
 
     binary = binary.astype(np.uint8)
@@ -39,28 +58,33 @@ def detect_stars(channel, config):
         dilated, connectivity=8
     )
 
-    clean = np.zeros_like(dilated)
-    for i in range(1, num):
-        if stats[i, cv2.CC_STAT_AREA] >= 3:
-            clean[labels == i] = 1
+    # Per-label keep table, applied to every pixel in one lookup
+    min_area = max(1, round(3 * scale ** 2))
+    keep = (stats[:, cv2.CC_STAT_AREA] >= min_area).astype(np.uint8)
+    keep[0] = 0
+    clean = keep[labels]
 
-    mask = gaussian_filter(clean.astype(float), sigma=1.5)
-    return np.clip(mask, 0, 1)
+    catalog = StarCatalog.from_components(labels, keep, channel, hp)
 
+    mask = gaussian(clean.astype(float), scaled_sigma(1.5, scale), config.FILTER_BACKEND)
+    return np.clip(mask, 0, 1), catalog
 
-def create_adaptive_boost(star_map, is_color, config):
+
+def star_luminance(star_map, is_color):
     if is_color:
-        lum = (
+        return (
             0.2126 * star_map[..., 2] +
             0.7152 * star_map[..., 1] +
             0.0722 * star_map[..., 0]
         )
-    else:
-        lum = star_map[..., 0]
+    return star_map[..., 0]
+
 
-    norm = lum / (np.max(lum) + 1e-10)
+def adaptive_boost(lum, lum_max, config):
+    """Per-pixel gain: strongest for faint stars, ENHANCE_FACTOR for bright."""
+    norm = lum / (lum_max + 1e-10)
 
-    boost = np.where(
+    return np.where(
         norm < config.BRIGHT_STAR_THRESHOLD,
         config.DIM_STAR_BOOST *
         (1 - norm / config.BRIGHT_STAR_THRESHOLD) +
@@ -68,30 +92,107 @@ def create_adaptive_boost(star_map, is_color, config):
         config.ENHANCE_FACTOR
     )
 
-    return lum, boost
 
+def create_adaptive_boost(star_map, is_color, config, lum_max=None):
+    """
+    lum_max: optional luminance maximum of the whole star map, for callers
+             that only pass part of it.
+    """
+    lum = star_luminance(star_map, is_color)
 
-def enhance_stars(star_map, is_color, config):
-    lum, boost = create_adaptive_boost(star_map, is_color, config)
+    if lum_max is None:
+        lum_max = np.max(lum)
 
-    if is_color:
-        enhanced = np.zeros_like(star_map)
-        for i in range(3):
-            ratio = star_map[..., i] / (lum + 1e-10)
-            enhanced[..., i] = boost * ratio * lum
-    else:
-        enhanced = star_map * boost
+    return lum, adaptive_boost(lum, lum_max, config)
+
+
+def enhance_stars(star_map, is_color, config, lum_max=None):
+    # Scaling every channel by the same gain keeps the star colour ratios
+    _, boost = create_adaptive_boost(star_map, is_color, config, lum_max)
+    return np.clip(star_map * boost[..., None], 0, 1)
 
-    return np.clip(enhanced, 0, 1)
 
+def stretch(x, strength, in_range="image"):
+    """
+    in_range: input range of the arcsinh-stretched data, as accepted by
+              skimage.exposure.rescale_intensity.
+    """
+    from skimage import exposure
 
-def stretch(x, strength):
     return exposure.rescale_intensity(
         np.arcsinh(x * strength),
+        in_range=in_range,
         out_range=(0, 1)
     )
 
 
-def sharpen(img):
-    blur = cv2.GaussianBlur(img, (0, 0), 1.2)
+def tone_curve(lo, hi, strength, gamma=1.0, bits=18):
+    """
+    Arcsinh stretch of [lo, hi] onto [0, 1], followed by a 1/gamma display
+    curve, tabulated on 2**bits + 1 evenly spaced inputs.
+    """
+    in_range = tuple(np.arcsinh(np.array([lo, hi]) * strength))
+    lut = stretch(np.linspace(lo, hi, 2**bits + 1), strength, in_range)
+    if gamma != 1:
+        lut **= 1 / gamma
+    return lut
+
+
+def tone_curve_error(lo, hi, strength, bits=18):
+    """
+    Bound on |apply_tone_curve - stretch| for data in [lo, hi] (lo >= 0,
+    gamma 1): the steepest slope of the stretch, at lo, times half a grid
+    step. About 0.4 LSB of 16-bit output for [0, 1], strength 10, 18 bits.
+    """
+    imin, imax = np.arcsinh(np.array([lo, hi]) * strength)
+    if imax == imin:
+        return 0.0
+    slope = strength / np.sqrt(1 + (strength * lo) ** 2) / (imax - imin)
+    return float(slope * (hi - lo) / 2**bits / 2)
+
+
+def apply_tone_curve(x, lut, lo, hi, out=None):
+    """
+    Map x in [lo, hi] through a tone_curve table by rounding to the
+    nearest grid point. out may be x itself.
+    """
+    if out is None:
+        out = np.empty(x.shape, lut.dtype)
+    n = len(lut) - 1
+    np.subtract(x, lo, out=out)
+    out *= n / (hi - lo) if hi > lo else 0.0
+    out += 0.5
+    return np.take(lut, out.astype(np.int32), out=out, mode="clip")
+
+
+def stretch_curve(lo, hi, config):
+    """
+    Stretch for data spanning [lo, hi] as a callable f(x, out=None): the
+    arcsinh stretch, then 1/GAMMA when APPLY_GAMMA is set. With
+    STRETCH_LUT_BITS it is a table lookup (see tone_curve_error),
+    otherwise it is evaluated in floating point.
+    """
+    strength = config.STRETCH_STRENGTH
+    gamma = config.GAMMA if config.APPLY_GAMMA else 1.0
+
+    if config.STRETCH_LUT_BITS:
+        lut = tone_curve(lo, hi, strength, gamma, config.STRETCH_LUT_BITS)
+        return lambda x, out=None: apply_tone_curve(x, lut, lo, hi, out)
+
+    in_range = tuple(np.arcsinh(np.array([lo, hi]) * strength))
+
+    def evaluate(x, out=None):
+        y = stretch(x, strength, in_range)
+        if gamma != 1:
+            y **= 1 / gamma
+        if out is None:
+            return y
+        out[...] = y
+        return out
+
+    return evaluate
+
+
+def sharpen(img, scale=1.0):
+    blur = cv2.GaussianBlur(img, (0, 0), scaled_sigma(1.2, scale))
     return np.clip(cv2.addWeighted(img, 1.1, blur, -0.1, 0), 0, 1)
@@ -0,0 +1,242 @@
+"""
+Out-of-core variant of pipeline.run for stacks larger than RAM.
+
+The input is read through a memory map and processed in row bands. Each
+band is widened by a halo covering the footprint of every filter applied
+to it, and background tiles/blocks follow the whole-image grid, so the
+core rows agree with pipeline.run to within 1 LSB (float32 rounding of
+the spilled layers). Whole-image statistics (normalisation max, hot pixel
+and star thresholds, star luminance max, stretch range) are gathered in
+dedicated passes, star/starless layers are spilled to temporary .npy
+memory maps, stars are attributed to the band holding their centroid,
+and the output TIFF is written band by band. Peak memory is bounded by
+config.STREAM_MEMORY_MB rather than by the image size; a budget too small
+for a tiled background band (see min_memory_mb) falls back to the
+multires background with a warning.
+"""
+import contextlib
+import copy
+import os
+import tempfile
+import warnings
+
+import numpy as np
+
+from .io import (
+    open_image, output_path, output_ext, open_output, create_output, catalog_path
+)
+from .preprocessing import (
+    remove_hot_pixels, hot_pixel_residual, robust_sigma, prepare_channels, MAD_SAMPLES
+)
+from .background import estimate_background
+from .catalog import StarCatalog
+from .tracing import NULL_TRACER
+from .compose import (
+    SHARPEN_HALO, separate_chunk, enhance_chunk, compose_chunk, sharpen_rows
+)
+from .stars import detect_stars, star_highpass, stretch_curve
+
+# Rows of context each stage needs on both sides of a band
+HOT_PIXEL_HALO = 1   # 3x3 median
+HIGHPASS_HALO = 16   # sigma 4 Gaussian, truncate 4
+DETECT_HALO = 25     # high-pass (16) + dilation (1) + area test (2) + sigma 1.5 mask blur (6)
+
+# Bytes held per sample (pixel x channel) of a band by the temporaries of
+# the heaviest pass (38-55 measured with tracemalloc); used to turn the
+# memory budget into a band height
+_BYTES_PER_SAMPLE = 64
+# Fewest core rows per band
+MIN_BAND_ROWS = 16
+
+
+def _background_halo(config):
+    if config.BG_MODE == "tiled":
+        # Every whole-image tile touching the core rows must fit in the band
+        return config.BLOCK_SIZE
+    # Coarse blur radius plus block alignment, decimation and upsampling
+    return int(4 * config.BG_KERNEL / 10 + 0.5) + 4 * config.BG_DOWNSAMPLE
+
+
+def _main_halo(config):
+    return HOT_PIXEL_HALO + max(DETECT_HALO, _background_halo(config))
+
+
+def _band_rows(w, c, halo, config):
+    """Core rows per band that fit STREAM_MEMORY_MB with their halos."""
+    budget = config.STREAM_MEMORY_MB * 1024 ** 2
+    return int(budget // (w * c * _BYTES_PER_SAMPLE)) - 2 * halo
+
+
+def min_memory_mb(w, c, config):
+    """Smallest STREAM_MEMORY_MB that streams a w-wide, c-channel image as configured."""
+    rows = 2 * _main_halo(config) + MIN_BAND_ROWS
+    return rows * w * c * _BYTES_PER_SAMPLE / 1024 ** 2
+
+
+def _bands(h, rows, halo):
+    """Yield (y0, y1, e0, e1): core rows and halo-extended rows."""
+    for y0 in range(0, h, rows):
+        y1 = min(y0 + rows, h)
+        yield y0, y1, max(0, y0 - halo), min(h, y1 + halo)
+
+
+def _read(src, e0, e1, scale):
+    band = np.array(src[e0:e1], dtype=np.float32)
+    if scale:
+        band /= scale
+    return band
+
+
+def _moments(x):
+    x = x.astype(np.float64, copy=False)
+    return np.array([x.size, x.sum(), np.square(x).sum()])
+
+
+def _std(m):
+    n, s, ss = m
+    return float(np.sqrt(max(ss / n - (s / n) ** 2, 0.0)))
+
+
+def run_streaming(input_file, config, report, tracer=NULL_TRACER):
+    """
+    Band-wise equivalent of pipeline.run.
+
+    report: callable(fraction, message) as used by pipeline.run.
+    tracer: records one span per band of every pass.
+    """
+    src = open_image(input_file)
+    h, w = src.shape[:2]
+    c = src.shape[2] if src.ndim == 3 else 1
+    main_halo = _main_halo(config)
+    rows = _band_rows(w, c, main_halo, config)
+    if rows < MIN_BAND_ROWS and config.BG_MODE == "tiled":
+        # Tiled bands must hold a whole tile on either side of the core
+        warnings.warn(
+            f"STREAM_MEMORY_MB={config.STREAM_MEMORY_MB} is below the "
+            f"{min_memory_mb(w, c, config):.0f} MB the tiled background needs "
+            f"for a {w}-pixel-wide image; using BG_MODE='multires'",
+            RuntimeWarning,
+        )
+        config = copy.copy(config)
+        config.BG_MODE = "multires"
+        main_halo = _main_halo(config)
+        rows = _band_rows(w, c, main_halo, config)
+    rows = max(rows, MIN_BAND_ROWS)
+
+    def passes(start, end, halo, message, stage):
+        bands = list(_bands(h, rows, halo))
+        for idx, band in enumerate(bands):
+            report(start + (end - start) * idx / len(bands),
+                   f"{message} (band {idx+1}/{len(bands)})")
+            with tracer.span(stage, rows=band[:2]):
+                yield band
+
+    # 1. Normalisation max
+    maxv = 0.0
+    for y0, y1, _, _ in passes(0.05, 0.10, 0, "Scanning image range", "scan_range"):
+        maxv = max(maxv, float(src[y0:y1].max()))
+    scale = maxv if maxv > 1.5 else None
+
+    # 2. Hot pixel residual spread
+    acc = np.zeros((c, 3))
+    samples = []
+    stride = max(1, h * w // MAD_SAMPLES)
+    for y0, y1, e0, e1 in passes(0.10, 0.15, HOT_PIXEL_HALO, "Measuring hot pixels",
+                                 "measure_hot_pixels"):
+        _, diff = hot_pixel_residual(_read(src, e0, e1, scale))
+        diff = diff[y0 - e0:y1 - e0].reshape(-1, c)
+        if config.HOT_PIXEL_SIGMA == "mad":
+            samples.append(diff[::stride])
+        else:
+            acc += [_moments(diff[:, i]) for i in range(c)]
+    if config.HOT_PIXEL_SIGMA == "mad":
+        samples = np.concatenate(samples)
+        sigmas = [robust_sigma(samples[:, i]) for i in range(c)]
+    else:
+        sigmas = [_std(m) for m in acc]
+
+    # 3. Star detection threshold
+    acc = np.zeros(3)
+    for y0, y1, e0, e1 in passes(0.15, 0.25, HOT_PIXEL_HALO + HIGHPASS_HALO,
+                                 "Measuring star threshold", "measure_threshold"):
+        band = remove_hot_pixels(_read(src, e0, e1, scale), sigmas=sigmas)
+        _, luminance, _ = prepare_channels(band)
+        hp = star_highpass(luminance, config.FILTER_BACKEND)
+        acc += _moments(hp[y0 - e0:y1 - e0])
+    threshold = config.THRESH_SIGMA * _std(acc)
+
+    with tempfile.TemporaryDirectory(dir=config.STREAM_TMPDIR) as tmp:
+        star_map = np.lib.format.open_memmap(
+            f"{tmp}/star_map.npy", mode="w+", dtype=np.float32, shape=(h, w, c))
+        starless = np.lib.format.open_memmap(
+            f"{tmp}/starless.npy", mode="w+", dtype=np.float32, shape=(h, w, c))
+
+        # 4. Stars, background and separation
+        catalogs = []
+        lum_max = 0.0
+        is_color = c > 1
+        for y0, y1, e0, e1 in passes(0.25, 0.75, main_halo,
+                                     "Detecting stars & background", "separate_band"):
+            band = remove_hot_pixels(_read(src, e0, e1, scale), sigmas=sigmas)
+            band, luminance, is_color = prepare_channels(band)
+            mask, catalog = detect_stars(luminance, config, threshold=threshold)
+            catalog = catalog.shifted(dy=e0)
+            catalogs.append(catalog.select(
+                (catalog.data["y"] >= y0 - 0.5) & (catalog.data["y"] < y1 - 0.5)
+            ))
+            background = estimate_background(band, config, origin=e0, height=h)
+
+            core = slice(y0 - e0, y1 - e0)
+            sm = np.empty((y1 - y0, w, c))
+            rest = np.empty((y1 - y0, w, c))
+            lum_max = max(lum_max, separate_chunk(
+                band[core], background[core], mask[core], is_color, sm, rest))
+            star_map[y0:y1] = sm
+            starless[y0:y1] = rest
+
+        # 5. Stretch input range
+        lo, hi = np.inf, -np.inf
+        for y0, y1, _, _ in passes(0.75, 0.80, 0, "Measuring stretch range",
+                                   "measure_stretch_range"):
+            enhanced = enhance_chunk(np.asarray(star_map[y0:y1], dtype=np.float64),
+                                     is_color, lum_max, config)
+            lo, hi = min(lo, enhanced.min()), max(hi, enhanced.max())
+        curve = stretch_curve(lo, hi, config)
+
+        # 6. Enhance, stretch, compose, sharpen and write
+        catalog = StarCatalog.concatenate(catalogs)
+        num_stars = len(catalog)
+        out_path = output_path(input_file, num_stars, output_ext(input_file, config))
+        writer = open_output(out_path, (h, w, c), config)
+        out = None if writer else create_output(out_path, (h, w, c))
+        try:
+            with writer or contextlib.nullcontext():
+                for y0, y1, e0, e1 in passes(0.80, 1.00, SHARPEN_HALO, "Composing output",
+                                             "compose_band"):
+                    enhanced = enhance_chunk(
+                        np.asarray(star_map[e0:e1], dtype=np.float64), is_color, lum_max,
+                        config)
+                    composed = compose_chunk(
+                        enhanced, np.asarray(starless[e0:e1], dtype=np.float64), curve)
+                    result = sharpen_rows(composed, y0 - e0, y1 - e0)
+                    if writer:
+                        writer.write(result)
+                    else:
+                        out[y0:y1] = (np.clip(result, 0, 1) * 65535).astype(np.uint16)
+                if writer:
+                    writer.close()
+                else:
+                    out.flush()
+        except BaseException:
+            # Writers remove their own partial file; the memory-mapped TIFF
+            # must not survive under the final name either
+            if out is not None:
+                out = None
+                os.remove(out_path)
+            raise
+        del out, star_map, starless
+
+    if config.STAR_CATALOG:
+        catalog.save(catalog_path(out_path, config.STAR_CATALOG))
+
+    return out_path
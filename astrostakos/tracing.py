@@ -0,0 +1,164 @@
+"""
+Structured per-stage instrumentation for pipeline runs.
+
+A Tracer records one event per span with start/end timestamps, thread
+id, array shapes and memory figures (peak RSS, and with TRACE_MEMORY the
+bytes allocated through tracemalloc and their peak within the span). Events export to Chrome
+trace-event JSON (chrome://tracing, Perfetto) and to a per-stage summary.
+When tracing is off, NULL_TRACER hands out a shared no-op context
+manager so instrumented code pays almost nothing.
+"""
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes, or None."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _shape(value):
+    shape = getattr(value, "shape", None)
+    return list(shape) if shape is not None else value
+
+
+class _NullTracer:
+    enabled = False
+    _null = contextlib.nullcontext()
+
+    def span(self, name, **args):
+        return self._null
+
+    def close(self):
+        pass
+
+
+NULL_TRACER = _NullTracer()
+
+
+class Tracer:
+    enabled = True
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.events = []
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter_ns()
+        self._pid = os.getpid()
+        # {token: peak} of the open spans, carried over tracemalloc.reset_peak()
+        self._open = {}
+        # Only a tracer that started tracemalloc stops it again
+        self._owns_tracemalloc = False
+        if memory:
+            import tracemalloc
+
+            self._tracemalloc = tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._owns_tracemalloc = True
+
+    @classmethod
+    def from_config(cls, config):
+        """Tracer for config, or NULL_TRACER when config.TRACE is off."""
+        return cls(memory=config.TRACE_MEMORY) if config.TRACE else NULL_TRACER
+
+    @contextlib.contextmanager
+    def span(self, name, **args):
+        """
+        Record the enclosed block as one event. Array-valued args are
+        stored as their shapes.
+        Memory figures are process-wide, so spans running concurrently on
+        worker threads see each other's allocations. traced_peak is the
+        highest traced total while the span was open.
+        """
+        if self.memory:
+            token = object()
+            with self._lock:
+                allocated = self._reset_peak()
+                self._open[token] = 0
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            end = time.perf_counter_ns()
+            event = {
+                "name": name,
+                "start_us": (start - self._t0) / 1000,
+                "end_us": (end - self._t0) / 1000,
+                "tid": threading.get_ident(),
+                "peak_rss": peak_rss(),
+                "args": {k: _shape(v) for k, v in args.items()},
+            }
+            with self._lock:
+                if self.memory:
+                    current = self._reset_peak()
+                    event["allocated"] = current - allocated
+                    event["traced_peak"] = self._open.pop(token)
+                self.events.append(event)
+
+    def _reset_peak(self):
+        # Fold the peak since the last reset into every open span, then
+        # restart it; returns the current traced size
+        current, peak = self._tracemalloc.get_traced_memory()
+        for token, span_peak in self._open.items():
+            self._open[token] = max(span_peak, peak)
+        self._tracemalloc.reset_peak()
+        return current
+
+    def chrome_trace(self):
+        """Events in Chrome trace-event format."""
+        events = []
+        for e in self.events:
+            args = dict(e["args"], peak_rss=e["peak_rss"])
+            if self.memory:
+                args.update(allocated=e["allocated"], traced_peak=e["traced_peak"])
+            events.append({
+                "name": e["name"], "ph": "X", "pid": self._pid, "tid": e["tid"],
+                "ts": e["start_us"], "dur": e["end_us"] - e["start_us"],
+                "args": args,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def summary(self):
+        """Total time, call count and memory figures per span name."""
+        stages = {}
+        for e in self.events:
+            s = stages.setdefault(e["name"], {"count": 0, "seconds": 0.0, "peak_rss": 0})
+            s["count"] += 1
+            s["seconds"] += (e["end_us"] - e["start_us"]) / 1e6
+            s["peak_rss"] = max(s["peak_rss"], e["peak_rss"] or 0)
+            if self.memory:
+                s["allocated"] = s.get("allocated", 0) + e["allocated"]
+                s["traced_peak"] = max(s.get("traced_peak", 0), e["traced_peak"])
+        return {"peak_rss": peak_rss(), "stages": stages}
+
+    def save(self, out_path):
+        """
+        Write <output>_trace.json (Chrome trace) and
+        <output>_trace_summary.json next to an output TIFF.
+        """
+        base = os.path.splitext(out_path)[0]
+        paths = (f"{base}_trace.json", f"{base}_trace_summary.json")
+        for path, data in zip(paths, (self.chrome_trace(), self.summary())):
+            with open(path, "w") as f:
+                json.dump(data, f, indent=1)
+        return paths
+
+    def close(self):
+        """Stop tracemalloc if this tracer started it. No spans may follow."""
+        if self._owns_tracemalloc:
+            self._tracemalloc.stop()
+            self._owns_tracemalloc = False
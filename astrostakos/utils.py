@@ -1,27 +1,47 @@
+import concurrent.futures
 import numpy as np
+from functools import lru_cache
 
+# Dtype the original per-row/column in-place products were evaluated in
+# (float32 array times a float64 scalar), so cached weights stay bit-exact
+_ALPHA_DTYPE = np.result_type(np.float32, np.float64(0.5))
 
+
+def _cosine_ramp(n, overlap):
+    """Per-index edge factors along one axis of length n."""
+    ramp = np.ones(n, dtype=_ALPHA_DTYPE)
+    alpha = 0.5 * (1 - np.cos(np.pi * np.arange(overlap) / overlap))
+    ramp[:overlap] = alpha
+    ramp[n - overlap:] = alpha[::-1]
+    return ramp
+
+
+@lru_cache(maxsize=64)
 def create_blend_weights(h, w, overlap):
     """
     Create smooth cosine-based blend weights for tile edges.
     Matches original AstroStakos behavior exactly.
+
+    Weights are built as an outer product of the row and column ramps and
+    cached by shape; the returned array is shared and read-only.
     """
     weights = np.ones((h, w), dtype=np.float32)
 
-    if overlap <= 0:
-        return weights
+    if overlap > 0:
+        overlap_h = min(overlap, h // 2)
+        overlap_w = min(overlap, w // 2)
 
-    overlap_h = min(overlap, h // 2)
-    overlap_w = min(overlap, w // 2)
+        rows = _cosine_ramp(h, overlap_h).astype(np.float32)
+        cols = _cosine_ramp(w, overlap_w)
+        np.multiply.outer(rows, cols, out=weights, casting="same_kind")
 
-    for i in range(overlap_h):
-        alpha = 0.5 * (1 - np.cos(np.pi * i / overlap_h))
-        weights[i, :] *= alpha
-        weights[-(i + 1), :] *= alpha
+    weights.flags.writeable = False
+    return weights
 
-    for i in range(overlap_w):
-        alpha = 0.5 * (1 - np.cos(np.pi * i / overlap_w))
-        weights[:, i] *= alpha
-        weights[:, -(i + 1)] *= alpha
 
-    return weights
+def map_threads(fn, items, workers):
+    """list(map(fn, items)) on up to `workers` threads (inline for 1)."""
+    if workers <= 1:
+        return [fn(item) for item in items]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as ex:
+        return list(ex.map(fn, items))
@@ -0,0 +1,56 @@
+"""
+Scaling benchmark for the tiled background executors.
+
+Times estimate_background_tiled on a benchmarks.synthetic channel for
+every BG_EXECUTOR backend across a range of worker counts.
+
+    python -m benchmarks.bench_background_scaling --megapixels 24 --workers 1 2 4 8 16 32
+"""
+import argparse
+import os
+import time
+
+from astrostakos.background import estimate_background_tiled
+from astrostakos.config import Config
+from benchmarks.synthetic import make_channel
+
+
+def time_backend(channel, backend, workers, repeat):
+    config = Config()
+    config.BG_EXECUTOR = backend
+    config.NUM_WORKERS = workers
+
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        estimate_background_tiled(channel, config)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--megapixels", type=float, default=24)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=[1, 2, 4, 8, os.cpu_count() or 1])
+    parser.add_argument("--backends", nargs="+",
+                        default=["serial", "threads", "processes"])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    channel, _ = make_channel(megapixels=args.megapixels)
+    h, w = channel.shape
+    print(f"channel {w}x{h} ({args.megapixels:g} MP), {os.cpu_count()} CPUs")
+
+    serial = time_backend(channel, "serial", 1, args.repeat)
+    print(f"{'backend':<10} {'workers':>7} {'seconds':>9} {'speedup':>8}")
+    for backend in args.backends:
+        counts = [1] if backend == "serial" else sorted(set(args.workers))
+        for n in counts:
+            t = serial if backend == "serial" else time_backend(
+                channel, backend, n, args.repeat)
+            print(f"{backend:<10} {n:>7} {t:>9.3f} {serial / t:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Scaling benchmark for detect_stars on dense synthetic star fields.
+
+Times detect_stars on benchmarks.synthetic fields while growing the star
+count at a fixed image size, then while growing the image at a fixed
+star density; both series should scale linearly with the number of
+pixels, not pixels x stars.
+
+    python -m benchmarks.bench_detect_stars --stars 1000 10000 50000
+"""
+import argparse
+import time
+
+from astrostakos.config import Config
+from astrostakos.stars import detect_stars
+from benchmarks.synthetic import make_channel, image_shape
+
+
+def time_detect(field, config, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        detect_stars(field, config)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--megapixels", type=float, default=24)
+    parser.add_argument("--stars", type=int, nargs="+",
+                        default=[1000, 5000, 10000, 25000, 50000])
+    parser.add_argument("--scales", type=float, nargs="+",
+                        default=[0.25, 0.5, 1.0])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    config = Config()
+    mp = args.megapixels
+
+    def field(megapixels, stars):
+        # Hot pixels would be removed before detection in the pipeline
+        channel, _ = make_channel(megapixels=megapixels, stars_per_mp=stars / megapixels,
+                                  hot_pixels_per_mp=0)
+        return channel
+
+    h, w = image_shape(mp)
+    print(f"fixed size {w}x{h}")
+    print(f"{'stars':>8} {'seconds':>9} {'ns/pixel':>9}")
+    for n in args.stars:
+        t = time_detect(field(mp, n), config, args.repeat)
+        print(f"{n:>8} {t:>9.3f} {t / (h * w) * 1e9:>9.2f}")
+
+    n = max(args.stars)
+    print(f"\nfixed density {n / mp:.0f} stars/MP")
+    print(f"{'pixels':>10} {'stars':>8} {'seconds':>9} {'ns/pixel':>9}")
+    for s in args.scales:
+        channel = field(mp * s, int(n * s))
+        t = time_detect(channel, config, args.repeat)
+        print(f"{channel.size:>10} {int(n * s):>8} {t:>9.3f} {t / channel.size * 1e9:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Import-time benchmark with a regression budget.
+
+Imports each entry point in a fresh interpreter, reports the best wall
+time over several runs and which heavy dependencies were loaded, and
+exits non-zero when a budget is exceeded or a forbidden module appears.
+
+    python -m benchmarks.bench_import_time --repeat 5
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+HEAVY = ["tkinter", "cv2", "tifffile", "scipy.ndimage", "skimage",
+         "rawpy", "PIL", "exifread"]
+
+# (statement, budget in seconds on top of the interpreter start-up,
+#  modules that must not be loaded by it)
+TARGETS = {
+    "astrostakos": (
+        "import astrostakos", 0.25, HEAVY,
+    ),
+    "astrostakos.cli": (
+        "import astrostakos.cli as c; c.build_parser()", 0.25, HEAVY,
+    ),
+    "astrostakos.pipeline": (
+        "import astrostakos.pipeline", 1.5, ["tkinter", "skimage"],
+    ),
+    "dss": (
+        "import dss", 0.1, ["exifread"],
+    ),
+    "ui": (
+        "import ui", 0.5, ["rawpy", "PIL", "exifread", "cv2", "scipy.ndimage", "skimage"],
+    ),
+}
+
+_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - t0
+print(json.dumps({{"seconds": elapsed,
+                   "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(statement, repeat):
+    best, loaded = float("inf"), []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(statement=statement, heavy=HEAVY)],
+            capture_output=True, text=True,
+        )
+        if out.returncode != 0:
+            raise RuntimeError(out.stderr.strip().splitlines()[-1])
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        best = min(best, result["seconds"])
+        loaded = result["loaded"]
+    return best, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("targets", nargs="*", default=list(TARGETS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--budget-scale", type=float, default=1.0,
+                        help="multiply every budget, e.g. for slow CI machines")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'target':<22} {'seconds':>8} {'budget':>7}  heavy modules loaded")
+    for name in args.targets:
+        statement, budget, forbidden = TARGETS[name]
+        budget *= args.budget_scale
+        try:
+            seconds, loaded = measure(statement, args.repeat)
+        except RuntimeError as e:
+            print(f"{name:<22} {'error':>8} {budget:>7.2f}  {e}")
+            failed = True
+            continue
+
+        bad = [m for m in loaded if m in forbidden]
+        status = "OK"
+        if seconds > budget or bad:
+            status = "FAIL" + (f" (forbidden: {', '.join(bad)})" if bad else "")
+            failed = True
+        print(f"{name:<22} {seconds:>8.3f} {budget:>7.2f}  "
+              f"{', '.join(loaded) or '-'}  {status}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Per-stage and end-to-end benchmarks on synthetic star fields.
+
+Renders a deterministic stack (see benchmarks.synthetic), times every
+pipeline stage on the output of the previous one plus a full
+pipeline.run, and writes the results as JSON so two revisions can be
+compared with --compare.
+
+    python -m benchmarks.bench_pipeline --megapixels 24 --output new.json
+    python -m benchmarks.bench_pipeline --compare old.json new.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from astrostakos.config import Config
+from benchmarks.synthetic import write_stack
+
+
+def _revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+            text=True, cwd=os.path.dirname(__file__),
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _time(fn, repeat):
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        runs.append(time.perf_counter() - t0)
+    return result, {"seconds": min(runs), "runs": runs}
+
+
+def run_benchmarks(path, config, repeat):
+    from astrostakos.io import load_image, save_output
+    from astrostakos.preprocessing import remove_hot_pixels, prepare_channels
+    from astrostakos.background import estimate_background_tiled
+    from astrostakos.stars import detect_stars, stretch_curve
+    from astrostakos.compose import compose
+    from astrostakos.pipeline import run
+
+    stages = {}
+    img, stages["load_image"] = _time(lambda: load_image(path), repeat)
+    img, stages["remove_hot_pixels"] = _time(lambda: remove_hot_pixels(img), repeat)
+    img, luminance, is_color = prepare_channels(img)
+    (star_mask, catalog), stages["detect_stars"] = _time(
+        lambda: detect_stars(luminance, config), repeat)
+    background, stages["estimate_background_tiled"] = _time(
+        lambda: estimate_background_tiled(img, config), repeat)
+
+    # Building the tone curve is part of compose; timed on its own as
+    # its cost depends on STRETCH_LUT_BITS rather than on the image size
+    _, stages["stretch_curve"] = _time(lambda: stretch_curve(0.0, 1.0, config), repeat)
+    result, stages["compose"] = _time(
+        lambda: compose(img, star_mask, background, is_color, config), repeat)
+    _, stages["save_output"] = _time(
+        lambda: save_output(result, path, len(catalog)), repeat)
+
+    _, full = _time(lambda: run(path, config), repeat)
+    return stages, full, len(catalog)
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    rows = [(name, old["stages"].get(name, {}).get("seconds"), entry["seconds"])
+            for name, entry in new["stages"].items()]
+    rows.append(("full run", old["full_run"]["seconds"], new["full_run"]["seconds"]))
+
+    print(f"{old['meta'].get('revision')} -> {new['meta'].get('revision')}")
+    print(f"{'stage':<28} {'old':>8} {'new':>8} {'speedup':>8}")
+    for name, a, b in rows:
+        ratio = f"{a / b:7.2f}x" if a else "       -"
+        print(f"{name:<28} {a or float('nan'):>8.3f} {b:>8.3f} {ratio}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--megapixels", type=float, default=8)
+    parser.add_argument("--stars-per-mp", type=float, default=500)
+    parser.add_argument("--psf", choices=["gaussian", "moffat"], default="gaussian")
+    parser.add_argument("--fwhm", type=float, default=2.5)
+    parser.add_argument("--hot-pixels-per-mp", type=float, default=20)
+    parser.add_argument("--gray", action="store_true", help="single-channel stack")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="JSON file for the results")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                        help="print a comparison of two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    config = Config()
+    params = {
+        "megapixels": args.megapixels, "stars_per_mp": args.stars_per_mp,
+        "psf": args.psf, "fwhm": args.fwhm,
+        "hot_pixels_per_mp": args.hot_pixels_per_mp,
+        "channels": 1 if args.gray else 3, "seed": args.seed,
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "Autosave.tif")
+        write_stack(path, **params)
+        stages, full, num_stars = run_benchmarks(path, config, args.repeat)
+
+    report = {
+        "meta": {
+            "revision": _revision(),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "repeat": args.repeat,
+            "synthetic": params,
+            "config": {k: getattr(config, k) for k in dir(Config) if k.isupper()},
+            "stars_detected": num_stars,
+        },
+        "stages": stages,
+        "full_run": full,
+    }
+
+    for name, entry in stages.items():
+        print(f"{name:<28} {entry['seconds']:8.3f}s")
+    print(f"{'full run':<28} {full['seconds']:8.3f}s")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Deterministic synthetic star-field stacks for benchmarks.
+
+make_stack() renders Gaussian or Moffat stars with per-star colour on a
+linear sky gradient, adds Gaussian noise and hot pixels, and returns a
+16-bit image shaped like a DeepSkyStacker Autosave.tif; make_channel()
+gives a single float channel for benchmarks of individual stages. The
+same arguments always produce the same pixels.
+"""
+import numpy as np
+
+
+def image_shape(megapixels, aspect=1.5):
+    w = int(round(np.sqrt(megapixels * 1e6 * aspect)))
+    h = int(round(megapixels * 1e6 / w))
+    return h, w
+
+
+def star_profile(r2, fwhm, psf="gaussian", beta=2.5):
+    """Peak-normalised PSF evaluated at squared radius r2."""
+    if psf == "gaussian":
+        sigma = fwhm / 2.3548
+        return np.exp(-r2 / (2 * sigma ** 2))
+    if psf == "moffat":
+        alpha = fwhm / (2 * np.sqrt(2 ** (1 / beta) - 1))
+        return (1 + r2 / alpha ** 2) ** -beta
+    raise ValueError(f"Unknown psf: {psf!r}")
+
+
+def make_stack(megapixels=4.0, stars_per_mp=500, psf="gaussian", fwhm=2.5,
+               sky=0.05, gradient=0.05, noise=0.005, hot_pixels_per_mp=20,
+               channels=3, seed=0):
+    """
+    Render a synthetic linear stack.
+
+    Returns (image, truth): a uint16 HxW(xC) array and a dict with the
+    true star positions ("x", "y") and amplitudes ("amp").
+    """
+    rng = np.random.default_rng(seed)
+    h, w = image_shape(megapixels)
+
+    yy = np.linspace(0, 1, h, dtype=np.float32)[:, None]
+    xx = np.linspace(0, 1, w, dtype=np.float32)[None, :]
+    field = np.empty((h, w, channels), np.float32)
+    tint = 1 + 0.2 * rng.uniform(-1, 1, channels)
+    field[...] = ((sky + gradient * (0.7 * xx + 0.3 * yy))[..., None] * tint)
+
+    n = int(stars_per_mp * megapixels)
+    radius = int(np.ceil(3 * fwhm))
+    ys = rng.uniform(radius, h - radius - 1, n)
+    xs = rng.uniform(radius, w - radius - 1, n)
+    # Many faint stars, few bright ones
+    amp = np.minimum(rng.pareto(1.5, n) * 0.05 + 0.02, 0.95).astype(np.float32)
+    colour = rng.uniform(0.7, 1.0, (n, channels)).astype(np.float32)
+
+    d = np.arange(-radius, radius + 1)
+    iy = np.floor(ys).astype(np.int64)[:, None, None] + d[None, :, None]
+    ix = np.floor(xs).astype(np.int64)[:, None, None] + d[None, None, :]
+    r2 = (iy - ys[:, None, None]) ** 2 + (ix - xs[:, None, None]) ** 2
+    stamp = (star_profile(r2, fwhm, psf) * amp[:, None, None]).astype(np.float32)
+
+    iy, ix = np.broadcast_arrays(iy, ix)
+    for c in range(channels):
+        np.add.at(field[..., c], (iy.ravel(), ix.ravel()),
+                  (stamp * colour[:, c, None, None]).ravel())
+
+    field += rng.normal(0, noise, field.shape).astype(np.float32)
+
+    hot = int(hot_pixels_per_mp * megapixels)
+    hy, hx = rng.integers(0, h, hot), rng.integers(0, w, hot)
+    field[hy, hx] = rng.uniform(0.5, 1.0, (hot, channels))
+
+    image = (np.clip(field, 0, 1) * 65535).astype(np.uint16)
+    if channels == 1:
+        image = image[..., 0]
+    return image, {"x": xs, "y": ys, "amp": amp}
+
+
+def make_channel(**kwargs):
+    """make_stack(channels=1, **kwargs) as float32 in [0, 1], with its truth."""
+    image, truth = make_stack(channels=1, **kwargs)
+    return image.astype(np.float32) / 65535, truth
+
+
+def write_stack(path, **kwargs):
+    """Render a stack with make_stack(**kwargs) and save it as a TIFF."""
+    import tifffile
+
+    image, truth = make_stack(**kwargs)
+    tifffile.imwrite(path, image, photometric="rgb" if image.ndim == 3 else "minisblack")
+    return truth
@@ -0,0 +1,99 @@
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+DEFAULT_PATH = Path.home() / ".astrostakos" / "metadata.sqlite"
+
+# SQLite's default limit on host parameters per statement is 999
+_BATCH = 500
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def stat_key(st):
+    """(size, mtime_ns) identifying one version of a file."""
+    return st.st_size, st.st_mtime_ns
+
+
+class MetadataCache:
+    """
+    Persistent per-file cache of header properties and DSS star counts.
+
+    Entries are keyed by absolute path and stored with the file's size
+    and mtime; a lookup only hits while both still match, so edited or
+    replaced files are re-read and their entries overwritten.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        with self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS metadata ("
+                " path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, value TEXT)"
+            )
+
+    @classmethod
+    def default(cls):
+        """Shared cache in ~/.astrostakos, or None if it cannot be opened."""
+        global _default
+        with _default_lock:
+            if _default is None:
+                try:
+                    _default = cls()
+                except (OSError, sqlite3.Error) as e:
+                    print(f"Metadata cache disabled: {e}")
+                    _default = False
+            return _default or None
+
+    def get_many(self, keys):
+        """
+        keys: {path: (size, mtime_ns)}. Returns {path: value} for the
+        entries stored under the same size and mtime.
+        """
+        paths = [str(p) for p in keys]
+        wanted = {str(p): tuple(k) for p, k in keys.items()}
+        found = {}
+        with self._lock:
+            for i in range(0, len(paths), _BATCH):
+                batch = paths[i:i + _BATCH]
+                rows = self._db.execute(
+                    "SELECT path, size, mtime_ns, value FROM metadata"
+                    f" WHERE path IN ({','.join('?' * len(batch))})",
+                    batch,
+                )
+                for path, size, mtime_ns, value in rows:
+                    if wanted[path] == (size, mtime_ns):
+                        found[path] = json.loads(value)
+        return found
+
+    def put_many(self, entries):
+        """entries: iterable of (path, (size, mtime_ns), value)."""
+        rows = [(str(p), k[0], k[1], json.dumps(v)) for p, k, v in entries]
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?)", rows
+            )
+
+    def prune(self, folder, present):
+        """Drop entries for files directly in folder that are not in present."""
+        prefix = os.path.join(str(folder), "")
+        present = {str(p) for p in present}
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT path FROM metadata WHERE path >= ? AND path < ?",
+                (prefix, prefix + "\uffff"),
+            )
+            gone = [
+                (p,) for (p,) in rows
+                if p not in present and os.path.dirname(p) == prefix[:-1]
+            ]
+            with self._db:
+                self._db.executemany("DELETE FROM metadata WHERE path = ?", gone)
+        return len(gone)
@@ -1,48 +1,116 @@
+import os
 from pathlib import Path
+
+from utils.threading import run_parallel
+from .cache import MetadataCache, stat_key
 from .image_props import get_image_properties
 
 
 SUPPORTED_EXTS = [".tif", ".tiff", ".fits", ".fit", ".jpg", ".jpeg", ".png", ".dng"]
+INFO_SUFFIX = ".info.txt"
+# Frames read between progress callbacks and cache writes
+READ_BATCH = 128
 
 
-def parse_dss_processed_images(folder: Path):
+def parse_dss_processed_images(folder: Path, workers=8, cache=None, on_frames=None,
+                               cancel=None):
     """
     Parse DSS processed frames in a folder.
 
+    The folder is listed once; headers and .info.txt files not found in
+    the metadata cache are then read on `workers` threads, READ_BATCH
+    frames at a time. Frames come back sorted by info file name.
+
+    cache: MetadataCache to reuse earlier reads from; defaults to
+           MetadataCache.default(). Pass False to read every file.
+    on_frames: optional callable receiving lists of frame properties as
+               they become available, cached frames first.
+    cancel: optional threading.Event; once set, reading stops after the
+            current batch and only the frames read so far are returned.
+
     Returns:
         frame_properties: list[dict]
         zero_star_frames: int
-        no_stacked_images_found: bool
     """
-    frame_properties = []
-    zero_star_frames = 0
+    if cache is None:
+        cache = MetadataCache.default()
+    frames = _scan(folder)
 
-    for info_file in folder.glob("*.info.txt"):
-        image_file = _find_matching_image(folder, info_file)
-        if not image_file:
-            continue
+    keys = {}
+    if cache:
+        for image, info in frames:
+            keys[image.path] = stat_key(image.stat())
+            keys[info.path] = stat_key(info.stat())
+    known = cache.get_many(keys) if keys else {}
 
-        props = get_image_properties(image_file)
-        props["Filename"] = image_file.name
+    missing = [f for f in frames if f[0].path not in known or f[1].path not in known]
+    if on_frames and len(missing) < len(frames):
+        missing_set = set(missing)
+        on_frames([_props(known, *f) for f in frames if f not in missing_set])
+    for i in range(0, len(missing), READ_BATCH):
+        if cancel is not None and cancel.is_set():
+            return _collect(known, frames)
+        batch = missing[i:i + READ_BATCH]
+        read = run_parallel(_read_frame, batch, workers)
+        fresh = {}
+        for (image, info), (props, stars) in zip(batch, read):
+            fresh[info.path] = stars
+            if props:  # failed reads are retried next time
+                fresh[image.path] = props
+        known.update(fresh)
+        if cache:
+            cache.put_many((path, keys[path], value) for path, value in fresh.items())
+        if on_frames:
+            on_frames([_props(known, *f) for f in batch])
+    if cache:
+        cache.prune(os.path.abspath(folder), keys)
 
-        stars = _parse_star_count(info_file)
-        props["Stars"] = stars
+    return _collect(known, frames)
 
-        if stars == 0:
-            zero_star_frames += 1
 
-        frame_properties.append(props)
+def _props(known, image, info):
+    props = dict(known.get(image.path, {}))
+    props["Filename"] = image.name
+    props["Stars"] = known[info.path]
+    return props
 
+
+def _collect(known, frames):
+    frame_properties = [_props(known, *f) for f in frames if f[1].path in known]
+    zero_star_frames = sum(1 for props in frame_properties if props["Stars"] == 0)
     return frame_properties, zero_star_frames
 
 
-def _find_matching_image(folder: Path, info_file: Path):
-    base = info_file.stem.replace(".info", "")
-    for ext in SUPPORTED_EXTS:
-        candidate = folder / f"{base}{ext}"
-        if candidate.exists():
-            return candidate
-    return None
+def _scan(folder):
+    """
+    Pair every <name>.info.txt in folder with its frame <name><ext>,
+    preferring extensions in SUPPORTED_EXTS order, from a single
+    directory scan. Returns (image, info) os.DirEntry pairs sorted by
+    info file name.
+    """
+    images = {}
+    infos = []
+    with os.scandir(os.path.abspath(folder)) as entries:
+        for entry in entries:
+            if entry.name.endswith(INFO_SUFFIX):
+                infos.append(entry)
+                continue
+            stem, ext = os.path.splitext(entry.name)
+            if ext.lower() in SUPPORTED_EXTS:
+                images.setdefault(stem, {})[ext.lower()] = entry
+
+    frames = []
+    for info in sorted(infos, key=lambda e: e.name):
+        candidates = images.get(info.name[:-len(INFO_SUFFIX)], {})
+        image = next((candidates[e] for e in SUPPORTED_EXTS if e in candidates), None)
+        if image:
+            frames.append((image, info))
+    return frames
+
+
+def _read_frame(frame):
+    image, info = frame
+    return get_image_properties(image.path), _parse_star_count(Path(info.path))
 
 
 def _parse_star_count(info_file: Path) -> int:
@@ -0,0 +1,259 @@
+"""
+Minimal reader for TIFF/DNG IFD tags.
+
+Only the header, IFD0 and the EXIF sub-IFD are read, through a few
+block-sized preads, so the cost per file does not depend on its size.
+TIFF and DNG files are parsed directly; JPEG (APP1) and PNG (eXIf)
+files are searched for an embedded TIFF block within the first
+SCAN_BYTES. Values come back typed: str for ASCII, int or Fraction for
+a single number and a tuple for several.
+"""
+import os
+import struct
+from fractions import Fraction
+
+# Tags shown in frame summaries: {tag: name}
+TAG_NAMES = {
+    0x0100: "ImageWidth",
+    0x0101: "ImageLength",
+    0x0102: "BitsPerSample",
+    0x0103: "Compression",
+    0x010E: "ImageDescription",
+    0x010F: "Make",
+    0x0110: "Model",
+    0x0112: "Orientation",
+    0x011A: "XResolution",
+    0x011B: "YResolution",
+    0x0131: "Software",
+    0x0132: "DateTime",
+    0x828E: "CFAPattern",
+    0x8298: "Copyright",
+    0x829A: "ExposureTime",
+    0x829D: "FNumber",
+    0x8827: "ISOSpeedRatings",
+    0x9003: "DateTimeOriginal",
+    0x920A: "FocalLength",
+    0xC61A: "BlackLevel",
+}
+TAGS = {name: tag for tag, name in TAG_NAMES.items()}
+
+# Names of structural tags, only used when listing every tag
+OTHER_NAMES = {
+    0x00FE: "SubfileType",
+    0x0106: "PhotometricInterpretation",
+    0x0111: "StripOffsets",
+    0x0115: "SamplesPerPixel",
+    0x0116: "RowsPerStrip",
+    0x0117: "StripByteCounts",
+    0x011C: "PlanarConfiguration",
+    0x0128: "ResolutionUnit",
+    0x0142: "TileWidth",
+    0x0143: "TileLength",
+    0x0144: "TileOffsets",
+    0x0145: "TileByteCounts",
+    0x014A: "SubIFDs",
+    0x0153: "SampleFormat",
+    0x8769: "ExifOffset",
+    0x8825: "GPSInfo",
+}
+
+EXIF_IFD = 0x8769
+
+COMPRESSION = {
+    1: "Uncompressed", 2: "CCITT 1D", 3: "T4/Group 3 Fax", 4: "T6/Group 4 Fax",
+    5: "LZW", 6: "JPEG (old-style)", 7: "JPEG", 8: "Adobe Deflate",
+    9: "JBIG B&W", 10: "JBIG Color", 32766: "Next", 32769: "Epson ERF Compressed",
+    32771: "CCIRLEW", 32773: "PackBits", 32809: "Thunderscan", 32895: "IT8CTPAD",
+    32896: "IT8LW", 32897: "IT8MP", 32898: "IT8BL", 32908: "PixarFilm",
+    32909: "PixarLog", 32946: "Deflate", 32947: "DCS", 34661: "JBIG",
+    34676: "SGILog", 34677: "SGILog24", 34712: "JPEG 2000",
+    34713: "Nikon NEF Compressed", 65000: "Kodak DCR Compressed",
+    65535: "Pentax PEF Compressed",
+}
+ORIENTATION = {
+    1: "Horizontal (normal)", 2: "Mirrored horizontal", 3: "Rotated 180",
+    4: "Mirrored vertical", 5: "Mirrored horizontal then rotated 90 CCW",
+    6: "Rotated 90 CW", 7: "Mirrored horizontal then rotated 90 CW",
+    8: "Rotated 90 CCW",
+}
+RESOLUTION_UNIT = {1: "Not Absolute", 2: "Pixels/Inch", 3: "Pixels/Centimeter"}
+VALUE_NAMES = {0x0103: COMPRESSION, 0x0112: ORIENTATION, 0x0128: RESOLUTION_UNIT}
+
+BLOCK = 4096
+SCAN_BYTES = 1 << 16
+# Entries per IFD and bytes per value beyond which a file is treated as
+# corrupt or a value skipped
+MAX_ENTRIES = 1000
+MAX_VALUE_BYTES = 1 << 16
+
+# field type: (struct code, size); RATIONAL types are handled as pairs
+_TYPES = {
+    1: ("B", 1), 2: ("s", 1), 3: ("H", 2), 4: ("I", 4), 5: ("I", 8),
+    6: ("b", 1), 7: ("B", 1), 8: ("h", 2), 9: ("i", 4), 10: ("i", 8),
+    11: ("f", 4), 12: ("d", 8),
+}
+
+
+class _Source:
+    """Bounded reads from an open file, cached in BLOCK-aligned blocks."""
+
+    def __init__(self, f):
+        self._fd = f.fileno()
+        self._f = f
+        self._blocks = {}
+
+    def _block(self, i):
+        data = self._blocks.get(i)
+        if data is None:
+            if hasattr(os, "pread"):
+                data = os.pread(self._fd, BLOCK, i * BLOCK)
+            else:  # Windows
+                self._f.seek(i * BLOCK)
+                data = self._f.read(BLOCK)
+            self._blocks[i] = data
+        return data
+
+    def read(self, offset, size):
+        first, last = offset // BLOCK, (offset + size - 1) // BLOCK
+        data = b"".join(self._block(i) for i in range(first, last + 1))
+        start = offset - first * BLOCK
+        out = data[start:start + size]
+        if len(out) < size:
+            raise ValueError(f"truncated read at offset {offset}")
+        return out
+
+
+def _tiff_start(src):
+    """Offset of the TIFF header inside the file, or None."""
+    head = src.read(0, 8)
+    if head[:4] in (b"II*\0", b"MM\0*"):
+        return 0
+    if head[:2] == b"\xff\xd8":
+        return _jpeg_exif(src)
+    if head == b"\x89PNG\r\n\x1a\n":
+        return _png_exif(src)
+    return None
+
+
+def _jpeg_exif(src):
+    pos = 2
+    while pos < SCAN_BYTES:
+        marker, length = struct.unpack(">2sH", src.read(pos, 4))
+        if marker[0] != 0xFF or marker[1] in (0xD9, 0xDA):  # EOI / start of scan
+            return None
+        if marker[1] == 0xE1 and src.read(pos + 4, 6) == b"Exif\0\0":
+            return pos + 10
+        pos += 2 + length
+    return None
+
+
+def _png_exif(src):
+    pos = 8
+    while pos < SCAN_BYTES:
+        length, kind = struct.unpack(">I4s", src.read(pos, 8))
+        if kind == b"eXIf":
+            return pos + 8
+        if kind in (b"IDAT", b"IEND"):
+            return None
+        pos += 12 + length
+    return None
+
+
+class _Tiff:
+    def __init__(self, src, start):
+        self.src = src
+        self.start = start
+        order = src.read(start, 2)
+        self.endian = "<" if order == b"II" else ">"
+        magic, self.ifd0 = self.unpack("HI", 2)
+        if magic != 42:  # BigTIFF and others
+            raise ValueError("not a classic TIFF")
+
+    def unpack(self, fmt, offset):
+        fmt = self.endian + fmt
+        return struct.unpack(fmt, self.src.read(self.start + offset, struct.calcsize(fmt)))
+
+    def ifd(self, offset, wanted):
+        """{tag: value} for the tags of the IFD at offset that are in wanted."""
+        (count,) = self.unpack("H", offset)
+        if count > MAX_ENTRIES:
+            raise ValueError(f"implausible IFD with {count} entries")
+        raw = self.src.read(self.start + offset + 2, 12 * count)
+        tags = {}
+        for i in range(count):
+            entry = raw[12 * i:12 * i + 12]
+            tag, kind, n = struct.unpack(self.endian + "HHI", entry[:8])
+            if (wanted is not None and tag not in wanted) or kind not in _TYPES:
+                continue
+            value = self._value(kind, n, entry[8:])
+            if value is not None:
+                tags[tag] = value
+        return tags
+
+    def _value(self, kind, n, inline):
+        code, size = _TYPES[kind]
+        nbytes = n * size
+        if nbytes > MAX_VALUE_BYTES:
+            return None
+        if nbytes <= 4:
+            data = inline[:nbytes]
+        else:
+            (offset,) = struct.unpack(self.endian + "I", inline)
+            try:
+                data = self.src.read(self.start + offset, nbytes)
+            except ValueError:
+                return None
+        if kind == 2:
+            return data.split(b"\0", 1)[0].decode("utf-8", "replace")
+        if kind in (5, 10):
+            ints = struct.unpack(f"{self.endian}{2 * n}{code}", data)
+            values = tuple(
+                Fraction(a, b) if b else Fraction(0) for a, b in zip(ints[::2], ints[1::2])
+            )
+        else:
+            values = struct.unpack(f"{self.endian}{n}{code}", data)
+        return values[0] if n == 1 else values
+
+
+def read_tags(path, wanted=frozenset(TAG_NAMES)):
+    """
+    Read IFD0 and the EXIF sub-IFD of path. Returns (image, exif) dicts
+    of {tag: value}, restricted to the tags in wanted (None for every
+    tag). Both are empty when the file carries no TIFF structure;
+    ValueError or struct.error is raised for a corrupt one.
+    """
+    with open(path, "rb") as f:
+        src = _Source(f)
+        try:
+            start = _tiff_start(src)
+        except (ValueError, struct.error):  # too short for any header
+            start = None
+        if start is None:
+            return {}, {}
+        tiff = _Tiff(src, start)
+        image = tiff.ifd(tiff.ifd0, None if wanted is None else wanted | {EXIF_IFD})
+        exif = {}
+        offset = image.get(EXIF_IFD) if wanted is None else image.pop(EXIF_IFD, None)
+        if isinstance(offset, int):
+            exif = tiff.ifd(offset, wanted)
+        return image, exif
+
+
+def tag_name(tag):
+    """Display name of tag, e.g. 'Make' or 'Tag 0xC612'."""
+    return TAG_NAMES.get(tag) or OTHER_NAMES.get(tag) or f"Tag 0x{tag:04X}"
+
+
+def printable(value, names=None):
+    """
+    Text of a tag value: numbers and ratios as-is ('1/250'), several
+    values as a list ('[8, 8, 8]'), long lists truncated. names maps
+    enumerated values to their descriptions.
+    """
+    if names is not None:
+        values = value if isinstance(value, tuple) else (value,)
+        return "".join(names.get(v, repr(v)) for v in values)
+    if not isinstance(value, tuple):
+        return str(value)
+    text = ", ".join(str(v) for v in (value[:20] if len(value) > 50 else value))
+    return f"[{text}, ... ]" if len(value) > 50 else f"[{text}]"
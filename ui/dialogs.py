@@ -1,11 +1,13 @@
 import threading
 import tkinter as tk
 from tkinter import messagebox, ttk
-from astrostakos import run
 from astrostakos.io import select_input_file
 
 
 def run_astrostakos():
+    # The pipeline and its imaging dependencies load on first run
+    from astrostakos import run
+
     try:
         # Choose file on main thread (file dialogs must run on main GUI thread)
         input_path = select_input_file()
@@ -1,10 +1,8 @@
 import tkinter as tk
 from tkinter import ttk
 from pathlib import Path
-import rawpy
-import numpy as np
-from PIL import Image, ImageTk
-from PIL import Image, ImageTk
+
+# rawpy and PIL are imported when a preview is first shown
 
 class FilePreview(ttk.Frame):
     def __init__(self, master):
@@ -58,6 +56,8 @@ class FilePreview(ttk.Frame):
             self.text.insert(tk.END, str(e))
 
     def _show_image(self, path):
+        from PIL import Image
+
         try:
             with Image.open(path) as img:
                 # For TIFF, explicitly convert to RGB to avoid gibberish
@@ -75,7 +75,11 @@ class FilePreview(ttk.Frame):
             self._show_text(path)
 
     def _show_dng_image(self, path):
+        from PIL import Image
+
         try:
+            import rawpy
+
             with rawpy.imread(str(path)) as raw:
                 rgb = raw.postprocess()
             img = Image.fromarray(rgb)
@@ -94,6 +98,8 @@ class FilePreview(ttk.Frame):
         if w < 10 or h < 10:
             return
 
+        from PIL import ImageTk
+
         img = self.original_image.copy()
         img.thumbnail((w - 20, h - 60))
         self.current_image = ImageTk.PhotoImage(img)
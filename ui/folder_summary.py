@@ -1,9 +1,104 @@
+import os
+import queue
+import threading
 import tkinter as tk
 from tkinter import ttk
 from pathlib import Path
 
 from dss.parser import parse_dss_processed_images
 
+# How often queued scan results are drawn into the text widget
+POLL_MS = 100
+
+# Define keys to show in desired order - updated for DNG files
+KEYS_TO_SHOW = [
+    "Filename",
+    "Device",           # Camera model
+    "Make",             # Camera brand
+    "Exposure",
+    "ISO",
+    "Aperture",         # Changed from "F-stop"
+    "Focal Length",
+    "Width",
+    "Height",
+    "Format",
+    "Date Taken",
+    "Orientation",      # New - shows rotation info
+    "Bits Per Sample",  # New - bit depth
+    "Bayer Pattern",    # New - CFA pattern
+    "Black Level",      # New - important for astro
+    "Compression",      # New
+    "Resolution",       # New
+    "File Size",        # New
+    "Copyright",        # New
+    "Description",      # New        # New - confirms it's RAW
+]
+
+
+class _Scan:
+    """
+    Summary of one folder, filled in by a background worker. The worker
+    only puts messages on `messages`; FolderSummary applies them on the
+    Tk thread.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.messages = queue.Queue()
+        self.cancel = threading.Event()
+
+        self.dss_outputs = None
+        self.frames = 0
+        self.star_total = 0
+        self.star_min = None
+        self.star_max = None
+        self.zero_star_frames = 0
+        self.sample = None
+        self.done = False
+        self.error = None
+
+    def run(self):
+        try:
+            # DSS stacked output files (filtered by suffix and naming)
+            with os.scandir(self.folder) as entries:
+                dss_outputs = sorted(
+                    e.name for e in entries
+                    if os.path.splitext(e.name)[1].lower() in (".tif", ".tiff")
+                    and ("autosave" in e.name.lower() or "stack" in e.name.lower())
+                )
+            self.messages.put(("outputs", dss_outputs))
+
+            frame_props, _ = parse_dss_processed_images(
+                self.folder,
+                on_frames=lambda batch: self.messages.put(("frames", batch)),
+                cancel=self.cancel,
+            )
+            # The sample is the first frame in name order
+            self.messages.put(("done", frame_props[0] if frame_props else None))
+        except Exception as e:
+            self.messages.put(("error", e))
+
+    def apply(self, kind, value):
+        if kind == "outputs":
+            self.dss_outputs = value
+        elif kind == "frames":
+            stars = [f.get("Stars", 0) for f in value]
+            lo, hi = min(stars), max(stars)
+            if self.frames:
+                lo, hi = min(lo, self.star_min), max(hi, self.star_max)
+            self.frames += len(stars)
+            self.star_total += sum(stars)
+            self.star_min, self.star_max = lo, hi
+            self.zero_star_frames += stars.count(0)
+            if self.sample is None:
+                self.sample = value[0]
+        elif kind == "done":
+            self.sample = value
+            self.done = True
+        elif kind == "error":
+            self.error = value
+            self.done = True
+
 
 class FolderSummary(ttk.Frame):
     def __init__(self, master):
@@ -12,90 +107,80 @@ class FolderSummary(ttk.Frame):
         self.text = tk.Text(self, wrap="word")
         self.text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
+        self._scan = None
+
     def show(self, folder: Path):
+        """
+        Summarize folder. The analysis runs on a worker thread and the
+        text fills in as results arrive; showing another folder cancels
+        the previous scan.
+        """
+        if self._scan:
+            self._scan.cancel.set()
+        self._scan = scan = _Scan(folder)
+        self._render(scan)
+        threading.Thread(target=scan.run, daemon=True).start()
+        self.after(POLL_MS, self._poll, scan)
+
+    def _poll(self, scan):
+        if scan is not self._scan:
+            return  # superseded by another folder
+        changed = False
+        while True:
+            try:
+                kind, value = scan.messages.get_nowait()
+            except queue.Empty:
+                break
+            scan.apply(kind, value)
+            changed = True
+        if changed:
+            self._render(scan)
+        if not scan.done:
+            self.after(POLL_MS, self._poll, scan)
+
+    def _render(self, scan):
         self.text.delete("1.0", tk.END)
 
-        files = list(folder.iterdir())
-
-        # DSS stacked output files (filtered by suffix and naming)
-        dss_outputs = [
-            f.name for f in files
-            if f.suffix.lower() in (".tif", ".tiff")
-            and ("autosave" in f.name.lower() or "stack" in f.name.lower())
-        ]
+        def insert(text):
+            self.text.insert(tk.END, text)
 
-        no_stacked = len(dss_outputs) == 0
-
-        # Parse DSS processed frames info
-        frame_props, zero_star_frames = parse_dss_processed_images(folder)
+        if scan.error is not None:
+            insert(f"⚠️ Could not read {scan.folder}: {scan.error}\n")
+            return
 
         # Frame count summary
-        if frame_props:
-            self.text.insert(tk.END, "📸 Frames detected:\n")
-            self.text.insert(tk.END, f"  • Total DSS-processed frames: {len(frame_props)}\n")
-        else:
-            self.text.insert(tk.END, "⚠️ No DSS-processed frames detected.\n")
+        if scan.frames:
+            insert("📸 Frames detected:\n")
+            insert(f"  • Total DSS-processed frames: {scan.frames}\n")
+        elif scan.done:
+            insert("⚠️ No DSS-processed frames detected.\n")
 
         # Star statistics summary
-        if frame_props:
-            stars = [f.get("Stars", 0) for f in frame_props]
-            if stars:
-                avg_stars = sum(stars) / len(stars)
-                self.text.insert(tk.END, "\n⭐ Star statistics (from DSS):\n")
-                self.text.insert(tk.END, f"  • Frames analyzed: {len(stars)}\n")
-                self.text.insert(tk.END, f"  • Average stars: {avg_stars:.1f}\n")
-                self.text.insert(tk.END, f"  • Min stars: {min(stars)}\n")
-                self.text.insert(tk.END, f"  • Max stars: {max(stars)}\n")
-
-                if zero_star_frames > 0:
-                    self.text.insert(tk.END, f"⚠️ {zero_star_frames} frame(s) had 0 detected stars\n")
+        if scan.frames:
+            insert("\n⭐ Star statistics (from DSS):\n")
+            insert(f"  • Frames analyzed: {scan.frames}\n")
+            insert(f"  • Average stars: {scan.star_total / scan.frames:.1f}\n")
+            insert(f"  • Min stars: {scan.star_min}\n")
+            insert(f"  • Max stars: {scan.star_max}\n")
+
+            if scan.zero_star_frames > 0:
+                insert(f"⚠️ {scan.zero_star_frames} frame(s) had 0 detected stars\n")
 
         # DSS output files summary
-        if dss_outputs:
-            self.text.insert(tk.END, "\n🧪 DSS Outputs:\n")
-            for f in dss_outputs:
-                self.text.insert(tk.END, f"  • {f}\n")
+        if scan.dss_outputs:
+            insert("\n🧪 DSS Outputs:\n")
+            for f in scan.dss_outputs:
+                insert(f"  • {f}\n")
 
         # Sample frame properties (show first frame as example)
-        if frame_props:
-            self.text.insert(tk.END, "\n📷 Sample processed frame properties:\n")
-            sample = frame_props[0]
-
-            # Define keys to show in desired order - updated for DNG files
-            keys_to_show = [
-                "Filename",
-                "Device",           # Camera model
-                "Make",             # Camera brand
-                "Exposure",
-                "ISO",
-                "Aperture",         # Changed from "F-stop"
-                "Focal Length",
-                "Width",
-                "Height",
-                "Format",
-                "Date Taken",
-                "Orientation",      # New - shows rotation info
-                "Bits Per Sample",  # New - bit depth
-                "Bayer Pattern",    # New - CFA pattern
-                "Black Level",      # New - important for astro
-                "Compression",      # New
-                "Resolution",       # New
-                "File Size",        # New
-                "Copyright",        # New
-                "Description",      # New        # New - confirms it's RAW
-            ]
-
-            for key in keys_to_show:
-                if key in sample:
-                    value = sample[key]
-                    if key == "GPSInfo" and isinstance(value, dict):
-                        # Format GPS info nicely
-                        gps_lines = [f"    {k}: {v}" for k, v in value.items()]
-                        gps_text = "\n".join(gps_lines)
-                        self.text.insert(tk.END, f"  • {key}:\n{gps_text}\n")
-                    else:
-                        self.text.insert(tk.END, f"  • {key}: {value}\n")
-
+        if scan.sample:
+            insert("\n📷 Sample processed frame properties:\n")
+            for key in KEYS_TO_SHOW:
+                if key in scan.sample:
+                    insert(f"  • {key}: {scan.sample[key]}\n")
+
+        if not scan.done:
+            insert(f"\n⏳ Scanning {scan.folder}…\n")
         # Warn if no stacked images found (based on dss outputs)
-        if no_stacked:
-            self.text.insert(tk.END, "\n⚠️ No stacked images found in this folder\n")
+        elif not scan.dss_outputs:
+            insert("\n⚠️ No stacked images found in this folder\n")
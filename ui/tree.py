@@ -1,10 +1,67 @@
+import os
+import queue
 import sys
 import string
+import threading
 import tkinter as tk
 from tkinter import ttk
 from pathlib import Path
 import re
 
+# Children inserted per Tk event loop turn when expanding a folder
+INSERT_CHUNK = 500
+# How often finished directory listings are collected
+POLL_MS = 20
+
+_DIGITS = re.compile(r"(\d+)")
+
+
+def natural_key(name):
+    """
+    Sort key for natural sorting (handles numbers correctly).
+    Example: "folder10" comes after "folder2"
+    """
+    parts = _DIGITS.split(name.lower())
+    parts[1::2] = map(int, parts[1::2])
+    return parts
+
+
+class _Listings:
+    """
+    Sorted directory listings, cached per path. A listing is reused while
+    the directory's mtime is unchanged, so re-expanding costs one stat.
+    """
+
+    def __init__(self):
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """(mtime_ns, folder names, file names) of path."""
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            cached = self._cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached
+
+        folders = []
+        files = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                # Answered from d_type; only symlinks and unknown types stat
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                (folders if is_dir else files).append(entry.name)
+        folders.sort(key=natural_key)
+        files.sort(key=natural_key)
+
+        listing = (mtime, folders, files)
+        with self._lock:
+            self._cache[path] = listing
+        return listing
+
 
 class FolderTree(ttk.Frame):
     def __init__(self, master, on_select):
@@ -21,26 +78,23 @@ class FolderTree(ttk.Frame):
         self.tree.bind("<<TreeviewOpen>>", self._open_node)
         self.tree.bind("<<TreeviewSelect>>", self._on_select)
 
-        self._load_roots()
+        self._listings = _Listings()
+        # Listings are made on worker threads and handed back through
+        # _results; only the Tk thread touches the tree
+        self._results = queue.Queue()
+        self._pending = 0
+        # node -> mtime of the listing its children were built from
+        self._shown = {}
+        # node -> token of the chunked insertion in progress
+        self._inserting = {}
 
-    def _sort_key(self, path):
-        """
-        Create a sort key for natural sorting (handles numbers correctly).
-        Example: "folder10" comes after "folder2"
-        """
-        name = path.name.lower()
-        
-        # Split name into text and numbers for natural sorting
-        def convert(text):
-            return int(text) if text.isdigit() else text.lower()
-        
-        return [convert(c) for c in re.split(r'(\d+)', name)]
+        self._load_roots()
 
     def _load_roots(self):
         self.tree.delete(*self.tree.get_children())
         roots = list(self._get_roots())
-        roots.sort(key=lambda x: self._sort_key(x))
-        
+        roots.sort(key=lambda x: natural_key(x.name))
+
         for root in roots:
             node = self.tree.insert("", "end", text=str(root), values=[str(root)])
             self._insert_dummy(node)
@@ -59,41 +113,83 @@ class FolderTree(ttk.Frame):
 
     def _open_node(self, _):
         node = self.tree.focus()
-        path = Path(self.tree.item(node, "values")[0])
+        path = self.tree.item(node, "values")[0]
 
-        self.tree.delete(*self.tree.get_children(node))
+        # Existing children stay in place until the listing arrives
+        threading.Thread(target=self._list, args=(node, path), daemon=True).start()
+        self._pending += 1
+        if self._pending == 1:
+            self.after(POLL_MS, self._poll)
 
+    def _list(self, node, path):
         try:
-            # Separate folders and files
-            folders = []
-            files = []
-            
-            for p in path.iterdir():
-                if p.is_dir():
-                    folders.append(p)
-                else:
-                    files.append(p)
-            
-            # Sort folders with natural sorting
-            folders.sort(key=lambda x: self._sort_key(x))
-            
-            # Sort files with natural sorting
-            files.sort(key=lambda x: self._sort_key(x))
-            
-            # Insert folders first, then files
-            for p in folders:
-                child = self.tree.insert(node, "end", text=p.name, values=[str(p)])
+            listing = self._listings.get(path)
+        except OSError:  # e.g. PermissionError
+            listing = None
+        self._results.put((node, path, listing))
+
+    def _poll(self):
+        while True:
+            try:
+                node, path, listing = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._pending -= 1
+            self._populate(node, path, listing)
+        if self._pending:
+            self.after(POLL_MS, self._poll)
+
+    def _populate(self, node, path, listing):
+        if not self.tree.exists(node):
+            return
+        if listing is not None and self._shown.get(node) == listing[0]:
+            return  # children are already up to date
+
+        for child in self.tree.get_children(node):
+            self._forget(child)
+        self.tree.delete(*self.tree.get_children(node))
+        self._shown.pop(node, None)
+        self._inserting.pop(node, None)
+        if listing is None:
+            return
+
+        mtime, folders, files = listing
+        self._shown[node] = mtime
+        # Insert folders first, then files
+        children = [(name, True) for name in folders] + [(name, False) for name in files]
+        token = self._inserting[node] = object()
+        self._insert_chunk(node, path, children, 0, token)
+
+    def _forget(self, node):
+        """Drop the bookkeeping of node and every node below it."""
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            self._shown.pop(node, None)
+            self._inserting.pop(node, None)
+            stack.extend(self.tree.get_children(node))
+
+    def _insert_chunk(self, node, path, children, start, token):
+        # Stop if the node was repopulated or removed meanwhile
+        if self._inserting.get(node) is not token or not self.tree.exists(node):
+            return
+
+        for name, is_dir in children[start:start + INSERT_CHUNK]:
+            child = self.tree.insert(node, "end", text=name,
+                                     values=[os.path.join(path, name)])
+            if is_dir:
                 self._insert_dummy(child)
-            
-            for p in files:
-                self.tree.insert(node, "end", text=p.name, values=[str(p)])
-                
-        except PermissionError:
-            pass
+
+        start += INSERT_CHUNK
+        if start < len(children):
+            # Let Tk redraw and handle input between chunks
+            self.after(1, self._insert_chunk, node, path, children, start, token)
+        else:
+            del self._inserting[node]
 
     def _on_select(self, _):
         node = self.tree.focus()
         if not node:
             return
         path = Path(self.tree.item(node, "values")[0])
-        self.on_select(path)
\ No newline at end of file
+        self.on_select(path)